@@ -0,0 +1 @@
+"""Offline benchmarks of the srcore compute paths; like srcore they need only pandas, numpy and pyarrow"""
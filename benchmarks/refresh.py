@@ -0,0 +1,116 @@
+"""Exercise the refresh path against the local fake spreadsheet: cold start, idle polls, edits, failures and bursts.
+
+    python -m benchmarks.refresh --size small --latency 0.2 --jitter 0.1 --error-rate 0.1 --quota-rate 0.05
+
+Everything runs offline. Requests go through SheetsGateway as in the app; counts come from
+LocalSheetsSource.calls (what reached the "API") and the gateway's stats.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from functools import partial
+from srcore import APP_SHEETS, SPREADSHEET_ID, LocalSheetsSource, SheetsGateway, RawSheetCache, RefreshController
+from srcore.sources import pad_rows, slice_range
+from benchmarks.synthetic import SIZES, make_grids
+
+def payload_kb(grids):
+    """JSON size of a whole-sheet download of the app's worksheets against a download of the declared ranges"""
+    sheets = {str(key): pad_rows(grids[key]) for key in APP_SHEETS}
+    ranges = {f"{key}!{a1}": slice_range(grids[key], a1) for key, a1 in RawSheetCache(SPREADSHEET_ID).ranges}
+    return {
+        'sheets': round(len(json.dumps(sheets, ensure_ascii=False)) / 1024, 1),
+        'ranges': round(len(json.dumps(ranges, ensure_ascii=False)) / 1024, 1),
+    }
+
+def timed_poll(controller):
+    """Seconds taken by one poll and the error it raised, if any"""
+    start = time.perf_counter()
+    try:
+        controller.poll()
+        error = None
+    except Exception as e:
+        error = type(e).__name__
+    return time.perf_counter() - start, error
+
+def burst(gateway, sessions):
+    """`sessions` identical downloads at once, as when many sessions cold-start together; returns seconds and errors"""
+    errors = {}
+    lock = threading.Lock()
+
+    def download():
+        try:
+            gateway.batch_get_ranges(RawSheetCache(SPREADSHEET_ID).ranges)
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    threads = [threading.Thread(target=download) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, errors
+
+def run(source, make_gateway, polls, edit_every, sessions):
+    """Cold start, then `polls` revision checks with an edit every `edit_every` polls, then a burst"""
+    gateway = make_gateway()
+    controller = RefreshController(gateway, RawSheetCache(SPREADSHEET_ID), check_seconds=0)
+    cold, cold_error = timed_poll(controller)
+    durations, errors, downloads = [], {}, 0
+    for index in range(polls):
+        if edit_every and index and index % edit_every == 0:
+            source.update({})
+        before = source.calls['batch_get_ranges']
+        seconds, error = timed_poll(controller)
+        durations.append(seconds)
+        downloads += source.calls['batch_get_ranges'] - before
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    # The burst gets a gateway of its own, so the polls above have not used up its read budget
+    burst_gateway = make_gateway()
+    burst_seconds, burst_errors = burst(burst_gateway, sessions) if sessions else (0.0, {})
+    return {
+        'cold_start_ms': cold * 1000,
+        'cold_start_error': cold_error,
+        'poll_median_ms': statistics.median(durations) * 1000 if durations else 0.0,
+        'poll_max_ms': max(durations) * 1000 if durations else 0.0,
+        'downloads': downloads,
+        'errors': errors,
+        'calls': dict(source.calls),
+        'gateway': gateway.stats(),
+        'burst_ms': burst_seconds * 1000,
+        'burst_errors': burst_errors,
+        'burst_gateway': burst_gateway.stats(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=list(SIZES), default='small')
+    # 40 polls, their downloads and the cold start stay within the default read budget of 50
+    parser.add_argument('--polls', type=int, default=40)
+    parser.add_argument('--edit-every', type=int, default=10, help='bump the revision every N polls (0: never)')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--quota-rate', type=float, default=0.0)
+    parser.add_argument('--sessions', type=int, default=20, help='concurrent identical downloads in the burst')
+    parser.add_argument('--reads-per-minute', type=int, default=50)
+    parser.add_argument('--backoff-base', type=float, default=0.05, help='first backoff in seconds (the app uses 1)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grids = make_grids(**SIZES[args.size], seed=args.seed)
+    source = LocalSheetsSource(
+        grids, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, quota_rate=args.quota_rate, seed=args.seed
+    )
+    print(f"{'payload_kb':<18}{payload_kb(grids)}")
+    make_gateway = partial(SheetsGateway, source, reads_per_minute=args.reads_per_minute, backoff_base=args.backoff_base)
+    for key, value in run(source, make_gateway, args.polls, args.edit_every, args.sessions).items():
+        print(f"{key:<18}{value:.1f}" if isinstance(value, float) else f"{key:<18}{value}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Run several server processes on one snapshot directory: one downloads, the others map what it saves.
+
+    python -m benchmarks.replicas --replicas 4 --size medium
+
+Each process runs a SnapshotRefresher with a SnapshotLease over the local fake spreadsheet and builds every
+page's datasets. It reports whether it led, the requests that reached the "API", the snapshot version it
+serves and the growth of its proportional set size (PSS, Linux only), in which pages mapped by several
+processes are split between them. With --independent every process refreshes on its own, without a lease,
+as the app did before, for comparison. Everything runs offline.
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from srcore import (
+    SPREADSHEET_ID, PAGE_DATASETS, LocalSheetsSource, RawSheetCache, RefreshController,
+    SnapshotStore, SnapshotLease, SnapshotRefresher, write_fixture, expand_dependencies,
+)
+from benchmarks.synthetic import SIZES, make_grids
+
+def pss_kb():
+    """Proportional set size of this process in KB, or None where /proc does not report it"""
+    try:
+        for line in Path('/proc/self/smaps_rollup').read_text().splitlines():
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def replica(fixture, directory, independent, timeout, barrier, results):
+    source = LocalSheetsSource.from_fixture(fixture)
+    before = pss_kb()
+    if independent:
+        # A directory of its own per process, as separate servers without a shared snapshot
+        directory = Path(tempfile.mkdtemp(dir=directory.parent))
+    controller = RefreshController(source, RawSheetCache(SPREADSHEET_ID), check_seconds=0)
+    refresher = SnapshotRefresher(
+        controller, SnapshotStore(directory), interval=1,
+        lease=None if independent else SnapshotLease(directory), follow_interval=0.1
+    )
+    names = expand_dependencies([name for page in PAGE_DATASETS.values() for name in page])
+    refresher.require(names)
+    start = time.perf_counter()
+    refresher.start()
+    snapshot = refresher.wait_for_snapshot(timeout)
+    for name in names:
+        snapshot.get(name)
+    ready = time.perf_counter() - start
+    # Measure while every replica holds its snapshot, so shared pages are split between all of them
+    barrier.wait()
+    after = pss_kb()
+    results.put({
+        'leader': refresher.leader,
+        'version': snapshot.version,
+        'source': snapshot.source,
+        'calls': dict(source.calls),
+        'ready_ms': round(ready * 1000, 1),
+        'pss_growth_kb': after - before if before is not None and after is not None else None,
+    })
+    barrier.wait()
+    refresher.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--size', choices=list(SIZES), default='medium')
+    parser.add_argument('--independent', action='store_true', help='every process downloads on its own')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = Path(workdir) / 'fixture.json'
+        write_fixture(fixture, make_grids(**SIZES[args.size], seed=args.seed))
+        barrier = context.Barrier(args.replicas)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=replica, args=(fixture, Path(workdir) / 'snapshot', args.independent, args.timeout, barrier, results)
+            )
+            for _ in range(args.replicas)
+        ]
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    for report in sorted(reports, key=lambda item: not item['leader']):
+        role = 'leader' if report['leader'] else 'follower'
+        print(f"{role:<10}" + "  ".join(f"{key} {value}" for key, value in report.items() if key != 'leader'))
+    downloads = sum(report['calls']['batch_get_ranges'] for report in reports)
+    print(f"\n{len(reports)} replicas, {downloads} download(s), {len({report['version'] for report in reports})} version(s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Time each compute stage of the three pages on synthetic sheets of several sizes, and size their datasets.
+
+    python -m benchmarks.run                    # every size, compared with the previous run
+    python -m benchmarks.run --sizes small --repeat 5
+
+Results are written to benchmarks/results/ as JSON, one file per run. Everything runs offline.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from srcore import DATASETS, DERIVED_DATASETS, WEEK_COLUMN, PLAN_DAYS, snapshot_from_grids, plan_demand, demand_frame
+from benchmarks.synthetic import SIZES, make_grids
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Derived datasets timed together as one stage, in dependency order
+INDEX_DATASETS = [
+    'subrecipe_index', 'batch_index', 'recipe_lines_index', 'ingredient_index',
+    'rm_type_index', 'pack_size_index', 'beginning_inventory_index',
+]
+MODEL_DATASETS = [
+    'recipe_lines', 'recipe_rm_types', 'subrecipes', 'subrecipe_options',
+    'raw_materials', 'pack_sizes', 'raw_material_table',
+]
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+
+def render_subrecipe(snapshot, batch_input=3):
+    """Ingredients table of the subrecipe with the most BOM lines, as the Subrecipe Guide renders it"""
+    subrecipes = snapshot.get('subrecipes')
+    pack_sizes = snapshot.get('pack_sizes')
+    subrecipe = max(subrecipes.values(), key=lambda item: len(item.lines))
+    rows = [
+        {
+            "Ingredient": line.ingredient,
+            "Pack Size": pack_sizes.get(line.key, ""),
+            "Qty per Batch (KG)": f"{line.qty_per_batch:,.2f}",
+            "Total Qty (KG)": f"{line.qty_per_batch * batch_input:,.2f}",
+            "UOM": "KG"
+        }
+        for line in subrecipe.lines
+        if line.qty_per_batch != 0
+    ]
+    return pd.DataFrame(rows).to_html(escape=False, index=False, classes='ingredients-table')
+
+def render_weekly(snapshot):
+    """Both Weekly Inventory tables for the unfiltered week"""
+    plan = snapshot.get('wps_plan')
+    materials = snapshot.get('plan_cube').materials_for(WEEK_COLUMN)
+    rows = [
+        {
+            "Raw Material": item.ingredient,
+            "Type": item.rm_type,
+            "Price": f"₱{item.price:,.2f}",
+            "Total Qty (KG)": f"{item.total_qty:,.2f}",
+            "Beginning (KG)": f"{item.beginning_inventory:,.2f}",
+            "Difference (KG)": f"<b>{item.difference:,.2f}</b>"
+        }
+        for item in materials.itertuples(index=False)
+    ]
+    return (
+        plan.table.to_html(escape=False, index=False, classes='wps-table')
+        + pd.DataFrame(rows).to_html(escape=False, index=False, classes='wps-table')
+    )
+
+def render_daily(snapshot):
+    """Both Daily Inventory tables for every day"""
+    plan = snapshot.get('wps_plan')
+    plan_cube = snapshot.get('plan_cube')
+    html = []
+    for day, header in enumerate(plan.day_headers):
+        day_plan = plan.day_plan(day)[['Subrecipe', header]]
+        rows = [
+            {
+                "Raw Material": item.ingredient,
+                "Type": item.rm_type,
+                "Price": f"₱{item.price:,.2f}",
+                "Inventory on Hand (KG)": f"{item.on_hand:,.2f}"
+            }
+            for item in plan_cube.materials_for(day).itertuples(index=False)
+        ]
+        html.append(day_plan.to_html(escape=False, index=False, classes='wps-table'))
+        html.append(pd.DataFrame(rows).to_html(escape=False, index=False, classes='wps-table'))
+    return ''.join(html)
+
+def run_stages(grids):
+    """Time every stage once, on a fresh snapshot; returns {stage: seconds}"""
+    timings = {}
+    snapshot = snapshot_from_grids(grids, revision='benchmark')
+    with timed(timings, 'parse'):
+        for name in DATASETS:
+            snapshot.get(name)
+    with timed(timings, 'index'):
+        for name in INDEX_DATASETS:
+            snapshot.get(name)
+    with timed(timings, 'model'):
+        for name in MODEL_DATASETS:
+            snapshot.get(name)
+    with timed(timings, 'wps_plan'):
+        plan = snapshot.get('wps_plan')
+    with timed(timings, 'explode'):
+        demand_cube = plan_demand(plan.table['Subrecipe'], plan.batches, snapshot.get('bom_matrix'))
+    with timed(timings, 'cost'):
+        raw_material_table = snapshot.get('raw_material_table')
+        for column in range(PLAN_DAYS + 1):
+            demand_frame(demand_cube, column, raw_material_table)
+    with timed(timings, 'plan_cube'):
+        snapshot.get('plan_cube')
+    with timed(timings, 'render_subrecipe'):
+        render_subrecipe(snapshot)
+    with timed(timings, 'render_weekly'):
+        render_weekly(snapshot)
+    with timed(timings, 'render_daily'):
+        render_daily(snapshot)
+    return timings
+
+def memory_report(grids):
+    """Resident KB of every dataset once all of them are built"""
+    snapshot = snapshot_from_grids(grids, revision='benchmark')
+    for name in list(DATASETS) + list(DERIVED_DATASETS):
+        snapshot.get(name)
+    return {name: round(size / 1024, 1) for name, size in snapshot.memory_report().items()}
+
+def benchmark_size(shape, repeat):
+    """Min and median seconds of each stage over several runs"""
+    grids = make_grids(**shape)
+    runs = [run_stages(grids) for _ in range(repeat)]
+    return {
+        stage: {
+            'min': min(run[stage] for run in runs),
+            'median': statistics.median(run[stage] for run in runs),
+        }
+        for stage in runs[0]
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def latest_result(results_dir, exclude=None):
+    """Most recent earlier result file, or None"""
+    files = sorted(path for path in results_dir.glob('*.json') if path != exclude)
+    return files[-1] if files else None
+
+def print_report(result, previous=None):
+    """Median milliseconds per stage and size, with the change against a previous run"""
+    previous_sizes = previous['sizes'] if previous else {}
+    for size, stages in result['sizes'].items():
+        print(f"\n{size}  {result['shapes'][size]}")
+        for stage, timing in stages.items():
+            line = f"  {stage:<18}{timing['median'] * 1000:>10.1f} ms"
+            before = previous_sizes.get(size, {}).get(stage)
+            if before and before['median'] > 0:
+                change = (timing['median'] - before['median']) / before['median'] * 100
+                line += f"   {change:+6.1f}%"
+            print(line)
+        memory = result.get('memory', {}).get(size)
+        if memory:
+            before = (previous or {}).get('memory', {}).get(size, {})
+            print(f"  {'memory (KB)':<18}{sum(memory.values()):>10.1f} total")
+            for name, kb in sorted(memory.items(), key=lambda item: -item[1]):
+                line = f"    {name:<26}{kb:>10.1f}"
+                if before.get(name):
+                    line += f"   {(kb - before[name]) / before[name] * 100:+6.1f}%"
+                print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--results-dir', type=Path, default=RESULTS_DIR)
+    parser.add_argument('--compare', type=Path, help='result file to compare with (default: the previous run)')
+    args = parser.parse_args(argv)
+
+    created_at = datetime.now(timezone.utc)
+    result = {
+        'created_at': created_at.isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeat': args.repeat,
+        'shapes': {size: SIZES[size] for size in args.sizes},
+        'sizes': {size: benchmark_size(SIZES[size], args.repeat) for size in args.sizes},
+        'memory': {size: memory_report(make_grids(**SIZES[size])) for size in args.sizes},
+    }
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    path = args.results_dir / f"{created_at.strftime('%Y%m%dT%H%M%SZ')}.json"
+    path.write_text(json.dumps(result, indent=2), encoding='utf-8')
+
+    previous_path = args.compare or latest_result(args.results_dir, exclude=path)
+    previous = json.loads(previous_path.read_text(encoding='utf-8')) if previous_path else None
+    print_report(result, previous)
+    print(f"\nSaved {path}" + (f", compared with {previous_path.name}" if previous_path else ""))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure what each rerun allocates to get its page's datasets, with many sessions rerunning at once.
+
+    python -m benchmarks.sessions --size medium --sessions 20 --reruns 5
+
+Two ways of serving a rerun are compared on the same synthetic snapshot:
+  pickled  every dataset unpickled per rerun, as st.cache_data does on each cache hit
+  shared   references into the shared read-only snapshot, as the app does now
+
+Allocations are traced with tracemalloc while every session holds its page data at once, as during rendering.
+Everything runs offline.
+"""
+import argparse
+import pickle
+import threading
+import time
+import tracemalloc
+from types import MappingProxyType
+from srcore import PAGE_DATASETS, expand_dependencies, snapshot_from_grids, enable_copy_on_write
+from benchmarks.synthetic import SIZES, make_grids
+
+# As in the app: shared frames are handed out as Copy-on-Write views (always on from pandas 3)
+enable_copy_on_write()
+
+def pickled_loader(snapshot, names):
+    """Loader that copies each dataset out of a pickle on every call, like a st.cache_data hit"""
+    def plain(value):
+        return dict(value) if isinstance(value, MappingProxyType) else value
+    pickles = {name: pickle.dumps(plain(snapshot.get(name))) for name in names}
+    return lambda name: pickle.loads(pickles[name])
+
+def shared_loader(snapshot):
+    return snapshot.get
+
+def measure(load, names, sessions, reruns):
+    """Peak traced KB per session and ms per rerun, with `sessions` threads rerunning in lockstep"""
+    barrier = threading.Barrier(sessions)
+
+    def session():
+        for _ in range(reruns):
+            page_data = {name: load(name) for name in names}
+            # Every session holds its page data at the same time, then lets go before the next rerun
+            barrier.wait()
+            del page_data
+            barrier.wait()
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'peak_kb_per_session': round((peak - baseline) / sessions / 1024, 1),
+        'peak_kb': round((peak - baseline) / 1024, 1),
+        'ms_per_rerun': round(seconds / (sessions * reruns) * 1000, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=list(SIZES), default='medium')
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    snapshot = snapshot_from_grids(make_grids(**SIZES[args.size], seed=args.seed), revision='benchmark')
+    for page, names in PAGE_DATASETS.items():
+        for name in expand_dependencies(names):
+            snapshot.get(name)
+        loaders = {'pickled': pickled_loader(snapshot, names), 'shared': shared_loader(snapshot)}
+        print(f"\n{page}  ({args.sessions} sessions x {args.reruns} reruns)")
+        for mode, load in loaders.items():
+            result = measure(load, names, args.sessions, args.reruns)
+            print(f"  {mode:<10}" + "  ".join(f"{key} {value}" for key, value in result.items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Synthetic spreadsheets in the layout of the real one, for offline benchmarks.
+
+    python -m benchmarks.synthetic fixture.json --size medium   # fixture for SRGUIDE_FIXTURE
+"""
+import argparse
+import random
+from srcore import (
+    SUBRECIPE_SHEET, INGREDIENTS_SHEET, WPS_SHEET, BEGINNING_INVENTORY_SHEET, PACK_SIZE_SHEET, write_fixture
+)
+from srcore.sources import pad_rows
+
+# Sheet sizes: subrecipes (sheet index 1), ingredient rows (sheet index 4), raw materials and WPS rows
+SIZES = {
+    'small': dict(subrecipes=200, ingredient_rows=4000, raw_materials=300, wps_rows=150),
+    'medium': dict(subrecipes=1000, ingredient_rows=20000, raw_materials=1000, wps_rows=600),
+    'large': dict(subrecipes=5000, ingredient_rows=100000, raw_materials=2000, wps_rows=2500),
+}
+
+RM_TYPES = ["DRY", "PRODUCE", "FROZEN MEAT", "DAIRY", "CHILLED", ""]
+STORAGE_CONDITIONS = ["Chiller", "Freezer", "Dry storage"]
+DAY_HEADERS = ["3NOV", "4NOV", "5NOV", "6NOV", "7NOV", "8NOV", "9NOV"]
+
+# Columns of the WPS sheet (A to BH)
+WPS_COLUMNS = 60
+
+# The beginning inventory sheet is read from rows 3 to 182 only
+INVENTORY_ROWS = 180
+
+def make_grids(subrecipes, ingredient_rows, raw_materials, wps_rows, seed=0):
+    """Worksheet grids {sheet index: rows} with the headers and columns the parsers expect"""
+    rnd = random.Random(seed)
+    subrecipe_names = [f"Subrecipe {i:05d}" for i in range(subrecipes)]
+    raw_material_names = [f"Raw Material {i:05d}" for i in range(raw_materials)]
+
+    # Sheet index 1: name (A), pack size (G), shelf life (H), storage condition (I)
+    subrecipe_grid = [["Subrecipe", "B", "C", "D", "E", "F", "Pack Size", "Shelf Life", "Storage"]]
+    for name in subrecipe_names:
+        subrecipe_grid.append([
+            name, "", "", "", "", "",
+            rnd.choice(["0.5", "1", "2.5", "5"]), str(rnd.randint(1, 30)), rnd.choice(STORAGE_CONDITIONS)
+        ])
+
+    # Sheet index 4: BOM lines (A-D), price (E) and the raw material type list (G-H)
+    ingredient_grid = [["Subrecipe", "Ingredient", "Batch Output", "Qty", "Price", "F", "Raw Material", "Type"]]
+    for row in range(ingredient_rows):
+        name = subrecipe_names[row % subrecipes]
+        ingredient_name = rnd.choice(raw_material_names)
+        type_name = raw_material_names[row % raw_materials]
+        ingredient_grid.append([
+            name, ingredient_name, f"{rnd.uniform(5, 50):.2f}", f"{rnd.uniform(0, 5):.3f}",
+            f"₱{rnd.uniform(10, 5000):,.2f}", "", type_name, rnd.choice(RM_TYPES)
+        ])
+
+    # Sheet index 5: header on row 10, subrecipe in A and the seven days in P-V; like the real sheet, B-O
+    # and the columns after V hold planning figures the app never reads
+    wps_grid = [[f"Title {row}"] + [""] * (WPS_COLUMNS - 1) for row in range(9)]
+    header = ["SKU"] + [f"Column {i}" for i in range(1, WPS_COLUMNS)]
+    header[15:22] = DAY_HEADERS
+    wps_grid.append(header)
+    for row in range(wps_rows):
+        days = [rnd.choice(["", "0", "1", "2", "3", "0.5"]) for _ in DAY_HEADERS]
+        figures = [f"{rnd.uniform(0, 500):,.2f}" for _ in range(14)]
+        totals = [f"{rnd.uniform(0, 500):,.2f}" for _ in range(WPS_COLUMNS - 22)]
+        wps_grid.append([subrecipe_names[row % subrecipes]] + figures + days + totals)
+
+    # Sheet index 6: date in B1, header on row 2, then beginning inventory (A), on hand (B) and name (C)
+    inventory_grid = [["", "Nov 3", ""], ["Beginning", "On Hand", "Raw Material"]]
+    for name in rnd.sample(raw_material_names, min(INVENTORY_ROWS, raw_materials)):
+        inventory_grid.append([f"{rnd.uniform(0, 100):.2f}", f"{rnd.uniform(0, 100):.2f}", name])
+
+    # Sheet index 7: header on row 5, then raw material (A) and pack size (B)
+    pack_size_grid = [[""] * 2 for _ in range(4)] + [["Raw Material", "Pack Size"]]
+    for name in raw_material_names:
+        pack_size_grid.append([name, rnd.choice(["500g", "1kg", "5kg", "25kg"])])
+
+    return {
+        SUBRECIPE_SHEET: pad_rows(subrecipe_grid),
+        INGREDIENTS_SHEET: pad_rows(ingredient_grid),
+        WPS_SHEET: pad_rows(wps_grid),
+        BEGINNING_INVENTORY_SHEET: pad_rows(inventory_grid),
+        PACK_SIZE_SHEET: pad_rows(pack_size_grid),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic spreadsheet as a JSON fixture")
+    parser.add_argument('path')
+    parser.add_argument('--size', choices=list(SIZES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_fixture(args.path, make_grids(**SIZES[args.size], seed=args.seed))
+
+if __name__ == '__main__':
+    main()
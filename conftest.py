@@ -0,0 +1,8 @@
+"""Shared test fixtures; being at the repository root, this also makes srcore and benchmarks importable under plain `pytest`"""
+import pytest
+from benchmarks.synthetic import make_grids
+
+@pytest.fixture(scope='session')
+def grids():
+    """Small synthetic spreadsheet in the layout of the real one, {worksheet index: rows}"""
+    return make_grids(subrecipes=40, ingredient_rows=600, raw_materials=60, wps_rows=50)
@@ -0,0 +1,82 @@
+"""Headless core of the Subrecipe Guide: sheet loading, the recipe model and raw material demand.
+
+Nothing here imports Streamlit, so the heavy paths can be profiled or batch-run directly:
+
+    from srcore import snapshot_from_grids, WEEK_COLUMN
+
+    snapshot = snapshot_from_grids(grids)  # {worksheet index: rows}, as the Sheets API returns them
+    weekly = snapshot.get('plan_cube').materials_for(WEEK_COLUMN)
+
+Importing srcore needs only pandas, numpy and pyarrow; the Google Sheets client (gspread, google-auth) is
+imported on first use of SheetsClient or service_account_credentials.
+
+Importing srcore changes no pandas options. Frames read through Snapshot.get are zero-copy views of the shared
+snapshot only under Copy-on-Write: always on from pandas 3, and turned on for older pandas by
+enable_copy_on_write(), which the app calls. Otherwise each read returns a copy.
+"""
+from .layout import (
+    SPREADSHEET_ID,
+    SUBRECIPE_SHEET,
+    INGREDIENTS_SHEET,
+    WPS_SHEET,
+    BEGINNING_INVENTORY_SHEET,
+    PACK_SIZE_SHEET,
+    APP_SHEETS,
+)
+from .sources import (
+    DataSource,
+    LocalSheetsSource,
+    SourceUnavailableError,
+    QuotaExceededError,
+    read_fixture,
+    write_fixture,
+    source_from_env,
+)
+from .gateway import SheetsGateway, READS_PER_MINUTE
+from .ingest import TEXT, KEY, NUMBER, PRICE, INTEGER, CATEGORY, ingest
+from .datasets import DATASETS, DERIVED_DATASETS, PAGE_DATASETS, PAGE_SOURCES, APP_RANGES, expand_dependencies
+from .model import Subrecipe, BomLine, RawMaterial
+from .plan import (
+    PLAN_DAYS,
+    WEEK_COLUMN,
+    BomMatrix,
+    DemandCube,
+    WpsPlan,
+    PlanCube,
+    plan_demand,
+    demand_frame,
+    day_header_date,
+)
+from .snapshot import (
+    RawSheetCache,
+    RefreshController,
+    Snapshot,
+    build_snapshot,
+    snapshot_from_grids,
+    enable_copy_on_write,
+    SNAPSHOT_DIR,
+    SnapshotStore,
+    SnapshotLease,
+    SnapshotRefresher,
+)
+from .perf import (
+    PerfRecorder,
+    current_recorder,
+    span,
+    record_hit,
+    recording,
+    start_recording,
+    finish_recording,
+    configure_perf_log,
+    resident_bytes,
+)
+
+# --- GOOGLE SHEETS CLIENT ---
+# Imported on first use, so the headless core loads without the Google client libraries
+_SHEETS_NAMES = ('SheetsClient', 'service_account_credentials')
+
+def __getattr__(name):
+    if name in _SHEETS_NAMES:
+        from . import sheets
+        return getattr(sheets, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
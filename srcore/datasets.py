@@ -0,0 +1,296 @@
+"""Dataset registry: the worksheet parsers and the datasets derived from their output"""
+import logging
+from collections import namedtuple
+import pandas as pd
+from .layout import SUBRECIPE_SHEET, INGREDIENTS_SHEET, WPS_SHEET, BEGINNING_INVENTORY_SHEET, PACK_SIZE_SHEET
+from .model import (
+    build_subrecipe_index,
+    build_batch_index,
+    build_recipe_lines_index,
+    build_ingredient_index,
+    build_rm_type_index,
+    build_pack_size_index,
+    build_beginning_inventory_index,
+    build_recipe_lines,
+    build_recipe_rm_types,
+    build_subrecipes,
+    build_subrecipe_options,
+    build_raw_materials,
+    build_pack_sizes,
+    build_raw_material_table,
+)
+from .plan import build_bom_matrix, build_wps_plan, build_plan_cube
+from .ingest import TEXT, KEY, NUMBER, PRICE, INTEGER, CATEGORY, clean_blanks, sheet_column, conversion_errors, ingest
+
+# Parse problems are logged; the pages see them as empty datasets
+logger = logging.getLogger(__name__)
+
+# Columns the pages read from each sheet: name -> (position in the ranges, kind); the rest are dropped
+SUBRECIPE_LAYOUT = {
+    'name': (0, TEXT),
+    'key': (0, KEY),
+    'pack_size': (6, NUMBER),
+    'shelf_life': (7, INTEGER),
+    'storage_condition': (8, CATEGORY),
+}
+BATCH_LAYOUT = {
+    'key': (0, KEY),
+    'batch_output': (2, NUMBER),
+}
+INGREDIENT_LAYOUT = {
+    'subrecipe_key': (0, KEY),
+    'ingredient': (1, CATEGORY),
+    'ingredient_key': (1, KEY),
+    'qty': (3, NUMBER),
+    'price': (4, PRICE),
+    'raw_material_key': (6, KEY),
+    'rm_type': (7, CATEGORY),
+}
+BEGINNING_INVENTORY_LAYOUT = {
+    'beginning_inventory': (0, NUMBER),
+    'on_hand': (1, NUMBER),
+    'raw_material_key': (2, KEY),
+}
+PACK_SIZE_LAYOUT = {
+    'raw_material_key': (0, KEY),
+    'pack_size': (1, TEXT),
+}
+
+# --- PARSE SUBRECIPE OPTIONS ---
+def parse_subrecipe_data(data):
+    """Build subrecipe data from columns A-I of sheet index 1"""
+    try:
+        if len(data) < 2:
+            logger.warning("Not enough data in sheet index 1")
+            return pd.DataFrame()
+
+        # Create DataFrame with headers from first row
+        df = pd.DataFrame(data[1:], columns=data[0])
+        
+        # Keep the name, pack size, shelf life and storage condition, converted
+        subrecipe_df = ingest(df, SUBRECIPE_LAYOUT)
+        
+        # Pack size or shelf life text that is not a number, shown on the recipe; pack size is reported first
+        errors = pd.Series(pd.NA, index=df.index, dtype=object)
+        for column in ('shelf_life', 'pack_size'):
+            column_errors = conversion_errors(sheet_column(df, SUBRECIPE_LAYOUT[column][0]), subrecipe_df[column])
+            errors = column_errors.where(column_errors.notna(), errors)
+        subrecipe_df['parse_error'] = errors
+        
+        return subrecipe_df
+
+    except Exception as e:
+        logger.error(f"Error loading subrecipe data: {str(e)}")
+        return pd.DataFrame()
+
+# --- PARSE BATCH DATA ---
+def parse_batch_data(data):
+    """Build batch data from columns A-C of sheet index 4"""
+    try:
+        if len(data) < 2:
+            logger.warning("Not enough data in sheet index 4")
+            return pd.DataFrame()
+
+        # Create DataFrame with headers from first row
+        df = pd.DataFrame(data[1:], columns=data[0])
+        
+        # Keep the subrecipe and its batch output
+        return ingest(df, BATCH_LAYOUT)
+
+    except Exception as e:
+        logger.error(f"Error loading batch data: {str(e)}")
+        return pd.DataFrame()
+
+# --- PARSE INGREDIENTS DATA ---
+def parse_ingredients_data(data):
+    """Build ingredients data from columns A-H of sheet index 4 (5th sheet)"""
+    try:
+        if len(data) < 2:
+            logger.warning("Not enough data in sheet index 4 for ingredients")
+            return pd.DataFrame()
+
+        # Create DataFrame with headers from first row
+        df = pd.DataFrame(data[1:], columns=data[0])
+        
+        # Keep subrecipe, ingredient, qty, price, raw material and its type
+        return ingest(df, INGREDIENT_LAYOUT)
+
+    except Exception as e:
+        logger.error(f"Error loading ingredients data: {str(e)}")
+        return pd.DataFrame()
+
+# --- PARSE WPS DATA ---
+def parse_wps_data(data):
+    """Build WPS data from column A and columns P-V of sheet index 5 (6th sheet), from row 10 down"""
+    try:
+        if len(data) < 2:
+            logger.warning("Not enough data in sheet index 5")
+            return pd.DataFrame()
+
+        # Header is row 10 (the first row of the ranges), data starts at row 11
+        headers = data[0]
+        data_rows = data[1:]
+        
+        # Handle duplicate column names by adding suffixes
+        seen = {}
+        unique_headers = []
+        for header in headers:
+            if header == '' or header in seen:
+                # For empty or duplicate headers, create unique names
+                count = seen.get(header, 0)
+                seen[header] = count + 1
+                if header == '':
+                    unique_headers.append(f'Column_{len(unique_headers)}')
+                else:
+                    unique_headers.append(f'{header}_{count}')
+            else:
+                unique_headers.append(header)
+                seen[header] = 1
+        
+        # Create DataFrame with unique headers
+        df = pd.DataFrame(data_rows, columns=unique_headers)
+        
+        # Clean the data; the day cells stay text, as entered, for display
+        df = clean_blanks(df)
+        
+        return df
+
+    except Exception as e:
+        logger.error(f"Error loading WPS data: {str(e)}")
+        return pd.DataFrame()
+
+def parse_wps_header_row(data):
+    """Get the header row (row 10) of the WPS sheet: column A, then the day headers in P-V"""
+    if len(data) > 0:
+        return data[0]
+    return []
+
+# --- PARSE BEGINNING INVENTORY DATA ---
+def parse_beginning_inventory_data(data):
+    """Build beginning inventory data from A2:C182 of sheet index 6 (7th sheet)"""
+    try:
+        if len(data) < 2:
+            logger.warning("Not enough data in sheet index 6 for beginning inventory")
+            return pd.DataFrame()
+
+        # Header is at row 2, data is rows 3 to 182
+        headers = data[0]
+        data_rows = data[1:]
+        
+        # Create DataFrame
+        df = pd.DataFrame(data_rows, columns=headers)
+        
+        # Keep beginning inventory, inventory on hand and the raw material (Column C) they belong to
+        return ingest(df, BEGINNING_INVENTORY_LAYOUT)
+
+    except Exception as e:
+        logger.error(f"Error loading beginning inventory data: {str(e)}")
+        return pd.DataFrame()
+
+def parse_beginning_inventory_row1(data):
+    """Get Row 1 (A1:B1, for the date in B1) of the beginning inventory sheet"""
+    if len(data) > 0:
+        return data[0]
+    return []
+
+# --- PARSE PACK SIZE DATA ---
+def parse_pack_size_data(data):
+    """Build pack size data from columns A-B of sheet index 7 (8th sheet), from row 5 down"""
+    try:
+        if len(data) < 1:
+            logger.warning("Not enough data in sheet index 7 for pack size")
+            return pd.DataFrame()
+
+        # Header is row 5 (the first row of the range), data starts at row 6
+        headers = data[0]
+        data_rows = data[1:]
+        
+        # Create DataFrame
+        df = pd.DataFrame(data_rows, columns=headers)
+        
+        # Keep the raw material (Column A) and its pack size text
+        return ingest(df, PACK_SIZE_LAYOUT)
+
+    except Exception as e:
+        logger.error(f"Error loading pack size data: {str(e)}")
+        return pd.DataFrame()
+
+# --- DATASET REGISTRY ---
+# Each dataset names the worksheet it is derived from, the A1 ranges of it that it reads, its parser and
+# its empty value. Only the declared ranges are downloaded; the parser gets them side by side.
+DatasetSpec = namedtuple('DatasetSpec', ['sheet', 'ranges', 'parse', 'empty'])
+
+# Column A and the seven days (P-V) of the WPS, from the header on row 10
+WPS_RANGES = ['A10:A', 'P10:V']
+
+DATASETS = {
+    'subrecipe': DatasetSpec(SUBRECIPE_SHEET, ['A:I'], parse_subrecipe_data, pd.DataFrame),
+    'batch': DatasetSpec(INGREDIENTS_SHEET, ['A:C'], parse_batch_data, pd.DataFrame),
+    'ingredients': DatasetSpec(INGREDIENTS_SHEET, ['A:H'], parse_ingredients_data, pd.DataFrame),
+    'wps': DatasetSpec(WPS_SHEET, WPS_RANGES, parse_wps_data, pd.DataFrame),
+    'wps_header_row': DatasetSpec(WPS_SHEET, WPS_RANGES, parse_wps_header_row, list),
+    'beginning_inventory': DatasetSpec(
+        BEGINNING_INVENTORY_SHEET, ['A2:C182'], parse_beginning_inventory_data, pd.DataFrame
+    ),
+    'beginning_inventory_row1': DatasetSpec(BEGINNING_INVENTORY_SHEET, ['A1:B1'], parse_beginning_inventory_row1, list),
+    'pack_size': DatasetSpec(PACK_SIZE_SHEET, ['A5:B'], parse_pack_size_data, pd.DataFrame),
+}
+
+# Every (worksheet, A1 range) the app downloads, each once
+APP_RANGES = list(dict.fromkeys((spec.sheet, a1) for spec in DATASETS.values() for a1 in spec.ranges))
+
+# Datasets derived from other datasets, with the datasets they read; built once per snapshot, never persisted
+DerivedSpec = namedtuple('DerivedSpec', ['depends', 'build'])
+
+DERIVED_DATASETS = {
+    'subrecipe_index': DerivedSpec(['subrecipe'], build_subrecipe_index),
+    'batch_index': DerivedSpec(['batch'], build_batch_index),
+    'recipe_lines_index': DerivedSpec(['ingredients'], build_recipe_lines_index),
+    'ingredient_index': DerivedSpec(['ingredients'], build_ingredient_index),
+    'rm_type_index': DerivedSpec(['ingredients'], build_rm_type_index),
+    'pack_size_index': DerivedSpec(['pack_size'], build_pack_size_index),
+    'beginning_inventory_index': DerivedSpec(['beginning_inventory'], build_beginning_inventory_index),
+    'recipe_lines': DerivedSpec(['ingredients', 'recipe_lines_index'], build_recipe_lines),
+    'recipe_rm_types': DerivedSpec(['ingredients', 'recipe_lines_index'], build_recipe_rm_types),
+    'subrecipes': DerivedSpec(
+        ['subrecipe', 'batch', 'subrecipe_index', 'batch_index', 'recipe_lines'], build_subrecipes
+    ),
+    'subrecipe_options': DerivedSpec(['subrecipe'], build_subrecipe_options),
+    'raw_materials': DerivedSpec(
+        ['ingredients', 'beginning_inventory', 'ingredient_index', 'rm_type_index', 'beginning_inventory_index'],
+        build_raw_materials
+    ),
+    'pack_sizes': DerivedSpec(['pack_size', 'pack_size_index'], build_pack_sizes),
+    'bom_matrix': DerivedSpec(['recipe_lines'], build_bom_matrix),
+    'raw_material_table': DerivedSpec(['raw_materials'], build_raw_material_table),
+    'wps_plan': DerivedSpec(['wps', 'wps_header_row'], build_wps_plan),
+    'plan_cube': DerivedSpec(['wps_plan', 'recipe_rm_types', 'bom_matrix', 'raw_material_table'], build_plan_cube),
+}
+
+# Datasets each page reads; only these (and what they derive from) are materialized when the page renders
+PAGE_DATASETS = {
+    'subrecipe': ['subrecipe', 'ingredients', 'subrecipe_options', 'subrecipes', 'pack_sizes'],
+    'Weekly Inventory': ['wps', 'wps_plan', 'plan_cube'],
+    'daily_inventory': ['wps', 'beginning_inventory', 'beginning_inventory_row1', 'wps_plan', 'plan_cube'],
+}
+
+def expand_dependencies(names):
+    """The given dataset names plus everything they are derived from, dependencies first"""
+    expanded = []
+    def visit(name):
+        if name in expanded:
+            return
+        if name in DERIVED_DATASETS:
+            for dependency in DERIVED_DATASETS[name].depends:
+                visit(dependency)
+        expanded.append(name)
+    for name in names:
+        visit(name)
+    return expanded
+
+# Sheets the pages' datasets are parsed or derived from: what a leading process saves for the processes that
+# only map its snapshot, since they cannot download a sheet it left out
+PAGE_SOURCES = [
+    name for name in expand_dependencies([dataset for names in PAGE_DATASETS.values() for dataset in names])
+    if name in DATASETS
+]
@@ -0,0 +1,165 @@
+"""Gateway in front of a data source: call accounting, a read budget, jittered backoff and request coalescing"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from .sources import DataSource, SourceUnavailableError, QuotaExceededError
+from .perf import span
+
+logger = logging.getLogger(__name__)
+
+# --- QUOTA ---
+# Reads allowed per rolling minute; Google's default is 60 per user, so keep some headroom for other tools
+READS_PER_MINUTE = int(os.environ.get('SRGUIDE_READS_PER_MINUTE', 50))
+# Retries of a throttled or failed request, with full-jitter exponential backoff between them
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 64.0
+# Longest a request waits for a free slot in the read budget before giving up
+BUDGET_WAIT_SECONDS = 30.0
+BUDGET_WINDOW_SECONDS = 60.0
+
+class _InFlight:
+    """Result of a request other callers are waiting on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SheetsGateway(DataSource):
+    """Every request to the wrapped source goes through here, so bursts from many sessions stay under quota"""
+
+    def __init__(self, source, reads_per_minute=READS_PER_MINUTE, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS,
+                 budget_wait=BUDGET_WAIT_SECONDS):
+        if reads_per_minute < 1:
+            raise ValueError(f"reads_per_minute must be at least 1, got {reads_per_minute}")
+        self.source = source
+        self.reads_per_minute = reads_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget_wait = budget_wait
+        # Accounting: requests asked for by method, and what it took to serve them
+        self.calls = {}
+        self.requests_sent = 0
+        self.retries = 0
+        self.quota_errors = 0
+        self.coalesced = 0
+        self.throttled_seconds = 0.0
+        # Send times of the requests in the current budget window
+        self._sent = deque()
+        # After a 429 every caller holds off until then, not just the one that was throttled
+        self._blocked_until = 0.0
+        self._in_flight = {}
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        while self._sent and now - self._sent[0] >= BUDGET_WINDOW_SECONDS:
+            self._sent.popleft()
+
+    def _acquire(self):
+        """Wait for a slot in the read budget and any backoff after a 429; QuotaExceededError if too long"""
+        deadline = time.monotonic() + self.budget_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                if now >= self._blocked_until and len(self._sent) < self.reads_per_minute:
+                    self._sent.append(now)
+                    self.requests_sent += 1
+                    return
+                ready_at = self._blocked_until
+                if len(self._sent) >= self.reads_per_minute:
+                    ready_at = max(ready_at, self._sent[0] + BUDGET_WINDOW_SECONDS)
+            if ready_at > deadline:
+                raise QuotaExceededError(f"Read budget of {self.reads_per_minute} requests per minute exhausted")
+            wait = ready_at - now
+            with span('sheets:throttle'):
+                time.sleep(wait)
+            with self._lock:
+                self.throttled_seconds += wait
+
+    def _backoff(self, attempt):
+        """Full jitter: a random delay up to the capped exponential"""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _call(self, method, *args):
+        fn = getattr(self.source, method)
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                return fn(*args)
+            except (QuotaExceededError, SourceUnavailableError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                with self._lock:
+                    self.retries += 1
+                    if isinstance(e, QuotaExceededError):
+                        self.quota_errors += 1
+                        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                logger.warning("%s failed (%s); retry %d in %.1fs", method, e, attempt + 1, delay)
+                with span('sheets:backoff'):
+                    time.sleep(delay)
+
+    def _coalesced(self, method, *args):
+        """Run the request, or wait for an identical one already in flight and share its result"""
+        key = (method,) + tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+        try:
+            pending.result = self._call(method, *args)
+            return pending.result
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            pending.done.set()
+
+    def get_revision(self):
+        return self._coalesced('get_revision')
+
+    def batch_get_values(self, keys):
+        return self._coalesced('batch_get_values', list(keys))
+
+    def batch_get_ranges(self, ranges):
+        return self._coalesced('batch_get_ranges', list(ranges))
+
+    def invalidate(self):
+        self.source.invalidate()
+
+    def stats(self):
+        """Call counts and quota headroom in the current window"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            return {
+                'calls': dict(self.calls),
+                'requests_sent': self.requests_sent,
+                'reads_last_minute': len(self._sent),
+                'read_budget': self.reads_per_minute,
+                'headroom': self.reads_per_minute - len(self._sent),
+                'retries': self.retries,
+                'quota_errors': self.quota_errors,
+                'coalesced': self.coalesced,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'blocked_seconds': round(max(0.0, self._blocked_until - now), 3),
+            }
@@ -0,0 +1,86 @@
+"""Ingest stage: each sheet cut down to the columns the pages read, typed and compact, once per download"""
+import numpy as np
+import pandas as pd
+
+# Column kinds, declared per parsed sheet in its layout
+TEXT = 'text'          # cells as entered, for display
+KEY = 'key'            # names stripped and lowercased for case-insensitive matching, stored as categories
+NUMBER = 'number'      # quantities: thousands separators and accounting zeros allowed
+PRICE = 'price'        # peso amounts such as '₱1,234.50'
+INTEGER = 'integer'    # whole numbers; fractions are truncated the way int(float(x)) does
+CATEGORY = 'category'  # short labels repeated down the sheet, such as raw material types
+
+# Spreadsheet accounting format shows zero as '-', '- .0', '-0.0', '.00' ...
+ACCOUNTING_ZERO = r'-?\s*0*\.?0*'
+
+def clean_blanks(df):
+    """Empty cells to pd.NA, for a frame or a single column"""
+    return df.where(df.ne(''), pd.NA)
+
+def cell_text(values):
+    """Cells as stripped strings, '' for missing ones"""
+    return values.astype(object).where(values.notna(), '').astype(str).str.strip()
+
+def accounting_zero(text):
+    """Non-blank cell text that a spreadsheet shows for zero"""
+    return text.ne('') & text.str.fullmatch(ACCOUNTING_ZERO)
+
+def to_number(values, price=False):
+    """Cells as floats: the peso sign, thousands separators and accounting zeros handled; NaN if not a number"""
+    text = cell_text(values)
+    if price:
+        text = text.str.replace('₱', '', regex=False).str.strip()
+    text = text.str.replace(',', '', regex=False)
+    text = text.mask(accounting_zero(text), '0')
+    return pd.to_numeric(text, errors='coerce').astype(float)
+
+def to_integer(values):
+    """Cells as nullable integers, truncated; NA if not a finite number"""
+    numbers = to_number(values)
+    # Beyond the int64 range the cast would fail for the whole column; those cells become NA instead
+    numbers = numbers.where(np.isfinite(numbers) & (numbers.abs() < 2.0 ** 63))
+    return np.trunc(numbers).astype('Int64')
+
+def to_category(values):
+    """Cells as a category column; NA stays missing"""
+    return values.astype(object).where(values.notna(), None).astype('category')
+
+def to_key(values):
+    """Cells as normalized names in a category column; each distinct name is normalized once, NA stays missing"""
+    codes, names = pd.factorize(values.astype(object))
+    keys = np.array([name.strip().lower() if isinstance(name, str) else None for name in names] + [None], dtype=object)
+    return pd.Series(keys[codes], index=values.index).astype('category')
+
+CONVERTERS = {
+    TEXT: lambda values: values.astype(object),
+    KEY: to_key,
+    NUMBER: to_number,
+    PRICE: lambda values: to_number(values, price=True),
+    INTEGER: to_integer,
+    CATEGORY: to_category,
+}
+
+def conversion_errors(raw, converted):
+    """float()-style message for each non-blank cell that did not convert, NA elsewhere"""
+    failed = raw.notna() & converted.isna()
+    messages = pd.Series(pd.NA, index=raw.index, dtype=object)
+    # Numbers an integer column could not hold are reported as such, the rest as text that is not a number
+    numbers = to_number(raw[failed])
+    messages[failed] = [
+        f"could not convert string to float: {value!r}" if np.isnan(number) else f"cannot convert float {number!r} to integer"
+        for value, number in zip(raw[failed], numbers)
+    ]
+    return messages
+
+def sheet_column(df, position):
+    """Column of a parsed sheet with blanks as NA; all NA if the sheet is narrower than that"""
+    if position < len(df.columns):
+        return clean_blanks(df.iloc[:, position])
+    return pd.Series(pd.NA, index=df.index, dtype=object)
+
+def ingest(df, layout):
+    """Only the columns a layout declares ({name: (position, kind)}), blanks to NA and converted"""
+    return pd.DataFrame(
+        {name: CONVERTERS[kind](sheet_column(df, position)) for name, (position, kind) in layout.items()},
+        index=df.index
+    )
@@ -0,0 +1,13 @@
+"""The spreadsheet the app reads and its worksheet layout; no Google client needed to import it"""
+
+SPREADSHEET_ID = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
+
+# --- SHEET LAYOUT ---
+# Worksheet indices the app reads
+SUBRECIPE_SHEET = 1
+INGREDIENTS_SHEET = 4
+WPS_SHEET = 5
+BEGINNING_INVENTORY_SHEET = 6
+PACK_SIZE_SHEET = 7
+
+APP_SHEETS = [SUBRECIPE_SHEET, INGREDIENTS_SHEET, WPS_SHEET, BEGINNING_INVENTORY_SHEET, PACK_SIZE_SHEET]
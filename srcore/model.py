@@ -0,0 +1,270 @@
+"""Lookup indexes and the typed recipe model, built once per snapshot from the parsed sheets"""
+import numpy as np
+import pandas as pd
+
+# --- LOOKUP INDEXES ---
+def build_first_row_index(keys):
+    """Map each normalized key to the position of its first row (same row a boolean mask + iloc[0] finds)"""
+    index = {}
+    for position, key in enumerate(keys):
+        if isinstance(key, str) and key not in index:
+            index[key] = position
+    return index
+
+def build_group_index(keys):
+    """Map each normalized key to the positions of all its rows, in sheet order"""
+    groups = {}
+    for position, key in enumerate(keys):
+        if isinstance(key, str):
+            groups.setdefault(key, []).append(position)
+    return groups
+
+def _index_keys(df, column):
+    if df is None or column not in df.columns:
+        return []
+    return df[column].tolist()
+
+def build_subrecipe_index(snapshot):
+    """Normalized subrecipe -> row in subrecipe data (pack size, shelf life, storage)"""
+    return build_first_row_index(_index_keys(snapshot.get('subrecipe'), 'key'))
+
+def build_batch_index(snapshot):
+    """Normalized subrecipe -> row in batch data (batch output)"""
+    return build_first_row_index(_index_keys(snapshot.get('batch'), 'key'))
+
+def build_recipe_lines_index(snapshot):
+    """Normalized subrecipe -> rows of its ingredients"""
+    return build_group_index(_index_keys(snapshot.get('ingredients'), 'subrecipe_key'))
+
+def build_ingredient_index(snapshot):
+    """Normalized ingredient (Column B) -> row with its price and qty conversion"""
+    return build_first_row_index(_index_keys(snapshot.get('ingredients'), 'ingredient_key'))
+
+def build_rm_type_index(snapshot):
+    """Normalized raw material (Column G) -> row with its type (Column H)"""
+    return build_first_row_index(_index_keys(snapshot.get('ingredients'), 'raw_material_key'))
+
+def build_pack_size_index(snapshot):
+    """Normalized raw material -> row in pack size data"""
+    return build_first_row_index(_index_keys(snapshot.get('pack_size'), 'raw_material_key'))
+
+def build_beginning_inventory_index(snapshot):
+    """Normalized raw material -> row in beginning inventory data"""
+    return build_first_row_index(_index_keys(snapshot.get('beginning_inventory'), 'raw_material_key'))
+
+# --- RECIPE MODEL ---
+# Typed records compiled once per snapshot, so the pages only do arithmetic
+class Subrecipe:
+    """A subrecipe from sheet index 1 with its batch output and BOM lines"""
+    __slots__ = ('name', 'key', 'pack_size', 'shelf_life', 'storage_condition', 'batch_output', 'lines', 'parse_error')
+
+    def __init__(self, name, key, pack_size, shelf_life, storage_condition, batch_output, lines, parse_error=None):
+        self.name = name
+        self.key = key
+        self.pack_size = pack_size
+        self.shelf_life = shelf_life
+        self.storage_condition = storage_condition
+        self.batch_output = batch_output
+        self.lines = lines
+        # Message for a pack size / shelf life cell that could not be parsed
+        self.parse_error = parse_error
+
+    def expected_output(self, batches):
+        """Total expected output (KG) of a number of batches"""
+        return self.batch_output * batches
+
+    def expected_packs(self, batches):
+        """Whole packs filled by a number of batches, 0 without a pack size"""
+        if self.pack_size > 0:
+            return int(self.expected_output(batches) / self.pack_size)
+        return 0
+
+class BomLine:
+    """One ingredient of a subrecipe and its quantity per batch (KG)"""
+    __slots__ = ('ingredient', 'key', 'qty_per_batch')
+
+    def __init__(self, ingredient, key, qty_per_batch):
+        self.ingredient = ingredient
+        self.key = key
+        self.qty_per_batch = qty_per_batch
+
+class RawMaterial:
+    """Price, qty conversion, type and inventory of a raw material"""
+    __slots__ = ('key', 'price', 'qty_conversion', 'rm_type', 'beginning_inventory', 'on_hand')
+
+    def __init__(self, key, price=0.0, qty_conversion=1.0, rm_type="N/A", beginning_inventory=0.0, on_hand=0.0):
+        self.key = key
+        self.price = price
+        self.qty_conversion = qty_conversion
+        self.rm_type = rm_type
+        # Beginning inventory (Column A) and inventory on hand (Column B) of sheet index 6
+        self.beginning_inventory = beginning_inventory
+        self.on_hand = on_hand
+
+def _is_blank(value):
+    return value is None or value is pd.NA or (isinstance(value, float) and value != value) or value == ''
+
+def _cell_float(value, default=0.0):
+    """Number of a cell converted at ingest, or the default for blank and unparseable cells"""
+    if _is_blank(value):
+        return default
+    return float(value)
+
+def _column_values(column):
+    """Column as an object array; a category column repeats one string object per distinct value"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = np.append(column.cat.categories.to_numpy(dtype=object), None)
+        return categories[column.cat.codes.to_numpy()]
+    return column.to_numpy(dtype=object)
+
+def _columns(df, *names):
+    """Named columns of a parsed sheet as object arrays, or None if it has no rows"""
+    if df is None or df.empty:
+        return None
+    return [_column_values(df[name]) for name in names]
+
+def build_recipe_lines(snapshot):
+    """Normalized subrecipe -> BOM lines, deduplicated by ingredient (first row kept)"""
+    columns = _columns(snapshot.get('ingredients'), 'ingredient', 'ingredient_key', 'qty')
+    if columns is None:
+        return {}
+    ingredients, dedup_keys, quantities = columns
+
+    recipe_lines = {}
+    for key, positions in snapshot.get('recipe_lines_index').items():
+        seen = set()
+        lines = []
+        for position in positions:
+            dedup_key = dedup_keys[position] if isinstance(dedup_keys[position], str) else None
+            if dedup_key in seen:
+                continue
+            seen.add(dedup_key)
+            # Column B is the ingredient, Column D its quantity per batch
+            ingredient = ingredients[position] if not _is_blank(ingredients[position]) else "N/A"
+            qty_per_batch = _cell_float(quantities[position])
+            # The key column holds one string per distinct name, shared by every line using it
+            lines.append(BomLine(ingredient, dedup_key if dedup_key is not None else "n/a", qty_per_batch))
+        recipe_lines[key] = tuple(lines)
+    return recipe_lines
+
+def build_recipe_rm_types(snapshot):
+    """Normalized subrecipe -> raw material types (Column H) of all its ingredient rows"""
+    columns = _columns(snapshot.get('ingredients'), 'rm_type')
+    if columns is None:
+        return {}
+    rm_types, = columns
+    return {
+        key: tuple(dict.fromkeys(rm_types[position] for position in positions if not _is_blank(rm_types[position])))
+        for key, positions in snapshot.get('recipe_lines_index').items()
+    }
+
+def build_subrecipes(snapshot):
+    """Normalized subrecipe -> Subrecipe for every row of sheet index 1 (first row per name)"""
+    columns = _columns(
+        snapshot.get('subrecipe'), 'name', 'pack_size', 'shelf_life', 'storage_condition', 'parse_error'
+    )
+    if columns is None:
+        return {}
+    names, pack_sizes, shelf_lives, storage_conditions, parse_errors = columns
+    batch_columns = _columns(snapshot.get('batch'), 'batch_output')
+    batch_index = snapshot.get('batch_index')
+    recipe_lines = snapshot.get('recipe_lines')
+
+    subrecipes = {}
+    for key, position in snapshot.get('subrecipe_index').items():
+        parse_error = None if _is_blank(parse_errors[position]) else parse_errors[position]
+        if parse_error is None:
+            # Pack Size (col G), Shelf Life (col H), Storage Condition (col I), converted at ingest
+            pack_size = _cell_float(pack_sizes[position])
+            shelf_life = int(shelf_lives[position]) if not _is_blank(shelf_lives[position]) else 0
+            storage_condition = (
+                str(storage_conditions[position]) if not _is_blank(storage_conditions[position]) else "Not specified"
+            )
+        else:
+            pack_size = 0.0
+            shelf_life = 0
+            storage_condition = "Not specified"
+
+        # Batch Output from sheet index 4, column C
+        batch_output = 0.0
+        batch_position = batch_index.get(key)
+        if batch_position is not None:
+            batch_output = _cell_float(batch_columns[0][batch_position])
+
+        subrecipes[key] = Subrecipe(
+            str(names[position]).strip(), key, pack_size, shelf_life, storage_condition,
+            batch_output, recipe_lines.get(key, ()), parse_error
+        )
+    return subrecipes
+
+def build_subrecipe_options(snapshot):
+    """Selector options: Column A names deduplicated case-insensitively, first spelling kept"""
+    subrecipe_df = snapshot.get('subrecipe')
+    if subrecipe_df is None or 'name' not in subrecipe_df.columns:
+        return []
+    seen_normalized = {}
+    for item in subrecipe_df['name'].dropna():
+        item_str = str(item).strip()
+        if item_str:
+            seen_normalized.setdefault(item_str.lower(), item_str)
+    return list(seen_normalized.values())
+
+def build_raw_materials(snapshot):
+    """Normalized raw material -> RawMaterial with price, qty conversion, type and inventory"""
+    ingredient_columns = _columns(snapshot.get('ingredients'), 'price', 'qty', 'rm_type')
+    inventory_columns = _columns(snapshot.get('beginning_inventory'), 'beginning_inventory', 'on_hand')
+    ingredient_index = snapshot.get('ingredient_index') if ingredient_columns is not None else {}
+    rm_type_index = snapshot.get('rm_type_index') if ingredient_columns is not None else {}
+    inventory_index = snapshot.get('beginning_inventory_index') if inventory_columns is not None else {}
+    prices, quantities, rm_types = ingredient_columns or (None, None, None)
+    beginning_inventories, on_hands = inventory_columns or (None, None)
+
+    raw_materials = {}
+    for key in set(ingredient_index) | set(rm_type_index) | set(inventory_index):
+        raw_material = RawMaterial(key)
+
+        # Price in Column E and qty conversion in Column D of the row matching Column B
+        position = ingredient_index.get(key)
+        if position is not None:
+            raw_material.price = _cell_float(prices[position])
+            raw_material.qty_conversion = _cell_float(quantities[position], 1.0) or 1.0
+
+        # Type in Column H of the row matching Column G
+        position = rm_type_index.get(key)
+        if position is not None and not _is_blank(rm_types[position]):
+            raw_material.rm_type = str(rm_types[position])
+
+        # Beginning inventory in Column A, inventory on hand in Column B
+        position = inventory_index.get(key)
+        if position is not None:
+            raw_material.beginning_inventory = _cell_float(beginning_inventories[position])
+            raw_material.on_hand = _cell_float(on_hands[position])
+
+        raw_materials[key] = raw_material
+    return raw_materials
+
+def build_pack_sizes(snapshot):
+    """Normalized raw material -> pack size text (Column B of the pack size sheet)"""
+    columns = _columns(snapshot.get('pack_size'), 'pack_size')
+    if columns is None:
+        return {}
+    pack_sizes, = columns
+    return {
+        key: str(pack_sizes[position])
+        for key, position in snapshot.get('pack_size_index').items()
+        if not _is_blank(pack_sizes[position])
+    }
+
+RAW_MATERIAL_COLUMNS = ['price', 'qty_conversion', 'rm_type', 'beginning_inventory', 'on_hand']
+
+def build_raw_material_table(snapshot):
+    """Raw materials as a table indexed by normalized name, for vectorized lookups"""
+    raw_materials = snapshot.get('raw_materials')
+    return pd.DataFrame(
+        [
+            (rm.price, rm.qty_conversion, rm.rm_type, rm.beginning_inventory, rm.on_hand)
+            for rm in raw_materials.values()
+        ],
+        index=pd.Index(list(raw_materials), dtype=object),
+        columns=RAW_MATERIAL_COLUMNS
+    )
@@ -0,0 +1,172 @@
+"""Lightweight timing spans for loaders, derived datasets and page rendering, with a JSON log and memory sizes"""
+import json
+import logging
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed stage: wall time, rows processed and whether a cache served it"""
+    __slots__ = ('stage', 'seconds', 'rows', 'cache', 'depth', 'error')
+
+    def __init__(self, stage, rows=None, cache=None, depth=0):
+        self.stage = stage
+        self.seconds = 0.0
+        self.rows = rows
+        # 'hit', 'miss' or None when the stage has no cache
+        self.cache = cache
+        # Nesting level, e.g. a dataset built while building another
+        self.depth = depth
+        self.error = None
+
+    def as_record(self):
+        return {
+            'stage': self.stage,
+            'ms': round(self.seconds * 1000, 3),
+            'rows': self.rows,
+            'cache': self.cache,
+            'depth': self.depth,
+            'error': self.error,
+        }
+
+class PerfRecorder:
+    """Spans of one unit of work: a page run, a fragment rerun or a background refresh"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = datetime.now(timezone.utc)
+        self.seconds = None
+        self.spans = []
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    @property
+    def elapsed_seconds(self):
+        return self.seconds if self.seconds is not None else time.perf_counter() - self._start
+
+    def as_records(self):
+        return [span.as_record() for span in self.spans]
+
+    def as_log_record(self):
+        return {
+            'event': 'perf',
+            'label': self.label,
+            'started_at': self.started_at.isoformat(),
+            'ms': round(self.elapsed_seconds * 1000, 3),
+            'spans': self.as_records(),
+        }
+
+# One active recorder per thread: Streamlit runs each session's script on its own thread
+_local = threading.local()
+
+def current_recorder():
+    return getattr(_local, 'recorder', None)
+
+def start_recording(label):
+    """Start recording spans on this thread, replacing a recorder left over from a stopped run"""
+    recorder = PerfRecorder(label)
+    _local.recorder = recorder
+    return recorder
+
+def finish_recording(recorder):
+    """Stop recording and write the recorder to the JSON log"""
+    recorder.seconds = time.perf_counter() - recorder._start
+    if current_recorder() is recorder:
+        _local.recorder = None
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(recorder.as_log_record(), default=str))
+    return recorder
+
+@contextmanager
+def recording(label):
+    """Record the block's spans; nested inside another recording it just adds to that one"""
+    recorder = current_recorder()
+    if recorder is not None:
+        yield recorder
+        return
+    recorder = start_recording(label)
+    try:
+        yield recorder
+    finally:
+        finish_recording(recorder)
+
+def count_rows(value):
+    """Rows in a dataset: frame or collection length, or the length of its table"""
+    value = getattr(value, 'table', value)
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+def resident_bytes(value, seen=None):
+    """Approximate bytes a dataset holds: frames and arrays deeply, records and containers recursively.
+
+    Objects whose id is in `seen` are skipped, so memory shared between datasets is counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        size = value.nbytes
+        if value.dtype == object:
+            size += sum(resident_bytes(item, seen) for item in value.flat)
+        return size
+    size = sys.getsizeof(value)
+    if isinstance(value, Mapping):
+        size += sum(resident_bytes(key, seen) + resident_bytes(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(resident_bytes(item, seen) for item in value)
+    elif hasattr(type(value), '__slots__'):
+        size += sum(resident_bytes(getattr(value, slot, None), seen) for slot in type(value).__slots__)
+    elif hasattr(value, '__dict__'):
+        size += resident_bytes(vars(value), seen)
+    return size
+
+@contextmanager
+def span(stage, rows=None, cache=None):
+    """Time a stage into the current recorder; a no-op outside a recording"""
+    recorder = current_recorder()
+    if recorder is None:
+        yield Span(stage, rows, cache)
+        return
+    item = Span(stage, rows, cache, recorder._depth)
+    recorder.spans.append(item)
+    recorder._depth += 1
+    start = time.perf_counter()
+    try:
+        yield item
+    except BaseException as e:
+        item.error = type(e).__name__
+        raise
+    finally:
+        item.seconds = time.perf_counter() - start
+        recorder._depth -= 1
+
+def record_hit(stage, rows=None):
+    """Zero-time span for a stage served from a cache"""
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.spans.append(Span(stage, rows, 'hit', recorder._depth))
+
+def configure_perf_log(target):
+    """Write perf records as JSON lines to a file, or to stderr for '-'; None leaves the log off"""
+    if not target or logger.handlers:
+        return logger
+    handler = logging.StreamHandler(sys.stderr) if target == '-' else logging.FileHandler(target, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
@@ -0,0 +1,226 @@
+"""Raw material demand of the WPS plan: the BOM matrix, the prepared plan and the plan cube"""
+import numpy as np
+import pandas as pd
+from .ingest import cell_text, accounting_zero, to_number
+
+# --- BOM MATRIX ---
+# Demand columns: the seven WPS days (columns P-V), then the whole week
+PLAN_DAYS = 7
+WEEK_COLUMN = PLAN_DAYS
+
+class BomMatrix:
+    """Subrecipe x raw material quantities per batch (KG), one column per ingredient name, stored sparse"""
+    __slots__ = ('recipe_positions', 'ingredients', 'keys', 'entry_recipes', 'entry_ingredients', 'entry_lines', 'entry_quantities')
+
+    def __init__(self, recipe_positions, ingredients, keys, entry_recipes, entry_ingredients, entry_lines, entry_quantities):
+        self.recipe_positions = recipe_positions
+        self.ingredients = ingredients
+        self.keys = keys
+        # Non-zero cells with their line number in the recipe, to order ingredients by first appearance; most
+        # subrecipes use a few of the ingredients, so a dense matrix would be almost all zeros
+        self.entry_recipes = entry_recipes
+        self.entry_ingredients = entry_ingredients
+        self.entry_lines = entry_lines
+        self.entry_quantities = entry_quantities
+
+def build_bom_matrix(snapshot):
+    """BOM lines with a positive quantity as a sparse subrecipe x ingredient matrix"""
+    recipe_positions = {}
+    ingredient_positions = {}
+    keys = []
+    entries = []
+    for recipe_key, lines in snapshot.get('recipe_lines').items():
+        recipe = recipe_positions.setdefault(recipe_key, len(recipe_positions))
+        for line_number, line in enumerate(lines):
+            if line.qty_per_batch <= 0:
+                continue
+            if line.ingredient not in ingredient_positions:
+                ingredient_positions[line.ingredient] = len(ingredient_positions)
+                keys.append(line.key)
+            entries.append((recipe, ingredient_positions[line.ingredient], line_number, line.qty_per_batch))
+
+    entries = np.array(entries, dtype=float).reshape(-1, 4)
+    return BomMatrix(
+        recipe_positions, np.array(list(ingredient_positions), dtype=object), np.array(keys, dtype=object),
+        entries[:, 0].astype(np.int32), entries[:, 1].astype(np.int32), entries[:, 2].astype(np.int32),
+        entries[:, 3].copy()
+    )
+
+class DemandCube:
+    """Raw material x day demand of a batch plan, with each ingredient's first appearance per column"""
+    __slots__ = ('ingredients', 'keys', 'demand', 'order')
+
+    def __init__(self, ingredients, keys, demand, order):
+        self.ingredients = ingredients
+        self.keys = keys
+        self.demand = demand
+        # Sort key of the first plan row and BOM line using the ingredient; -1 if it is not used
+        self.order = order
+
+    def column(self, column):
+        """Ingredients used in a demand column in order of first appearance, with their totals"""
+        used = np.flatnonzero(self.order[:, column] >= 0)
+        used = used[np.argsort(self.order[used, column], kind='stable')]
+        return pd.DataFrame({
+            'ingredient': self.ingredients[used],
+            'key': self.keys[used],
+            'total_qty': self.demand[used, column],
+        })
+
+def plan_demand(subrecipes, day_batches, bom_matrix):
+    """Demand cube for a plan of subrecipes and their batches (numbers) on each of the seven days"""
+    recipes = np.array(
+        [bom_matrix.recipe_positions.get(str(name).strip().lower(), -1) for name in subrecipes], dtype=np.int64
+    )
+    batches = np.column_stack([day_batches, day_batches.sum(axis=1)])
+    # A subrecipe counts for a day when it has batches that day, and for the week when it is in the plan
+    active = batches > 0
+    active[:, WEEK_COLUMN] = True
+    known = recipes >= 0
+
+    # Batches per subrecipe and column, then every ingredient and column in one product
+    recipe_batches = np.zeros((len(bom_matrix.recipe_positions), PLAN_DAYS + 1))
+    np.add.at(recipe_batches, recipes[known], batches[known])
+    demand = np.zeros((len(bom_matrix.ingredients), PLAN_DAYS + 1))
+    np.add.at(
+        demand, bom_matrix.entry_ingredients,
+        bom_matrix.entry_quantities[:, None] * recipe_batches[bom_matrix.entry_recipes]
+    )
+
+    # First plan row of each subrecipe per column, then the first (row, BOM line) of each ingredient
+    plan_rows = len(recipes)
+    first_row = np.full(recipe_batches.shape, plan_rows, dtype=np.int64)
+    rows, columns = np.nonzero(active & known[:, None])
+    np.minimum.at(first_row, (recipes[rows], columns), rows)
+
+    stride = int(bom_matrix.entry_lines.max(initial=0)) + 1
+    entry_rows = first_row[bom_matrix.entry_recipes]
+    entry_order = np.where(entry_rows < plan_rows, entry_rows * stride + bom_matrix.entry_lines[:, None], -1)
+    order = np.full(demand.shape, np.iinfo(np.int64).max, dtype=np.int64)
+    for column in range(PLAN_DAYS + 1):
+        used = entry_order[:, column] >= 0
+        np.minimum.at(order[:, column], bom_matrix.entry_ingredients[used], entry_order[used, column])
+    order[order == np.iinfo(np.int64).max] = -1
+    return DemandCube(bom_matrix.ingredients, bom_matrix.keys, demand, order)
+
+def demand_frame(cube, column, raw_material_table):
+    """One demand column with price, qty conversion, type, inventory and cost of each raw material"""
+    frame = cube.column(column)
+    # Raw material details; ingredients missing from every sheet get the defaults
+    details = raw_material_table.reindex(frame['key'].to_numpy(dtype=object))
+    frame['price'] = details['price'].fillna(0.0).to_numpy(dtype=float)
+    frame['qty_conversion'] = details['qty_conversion'].fillna(1.0).to_numpy(dtype=float)
+    frame['rm_type'] = details['rm_type'].fillna("N/A").to_numpy(dtype=object)
+    frame['beginning_inventory'] = details['beginning_inventory'].fillna(0.0).to_numpy(dtype=float)
+    frame['on_hand'] = details['on_hand'].fillna(0.0).to_numpy(dtype=float)
+    frame['cost'] = (frame['total_qty'] / frame['qty_conversion']) * frame['price']
+    # Shortfall against the beginning inventory, and the value of the inventory on hand
+    frame['difference'] = frame['total_qty'] - frame['beginning_inventory']
+    frame['on_hand_cost'] = (frame['on_hand'] / frame['qty_conversion']) * frame['price']
+    return frame
+
+# The inventory sheet writes dates as "Nov 3" where the WPS day headers say "3NOV"
+MONTH_NAMES = {
+    'JAN': 'Jan', 'FEB': 'Feb', 'MAR': 'Mar', 'APR': 'Apr',
+    'MAY': 'May', 'JUN': 'Jun', 'JUL': 'Jul', 'AUG': 'Aug',
+    'SEP': 'Sep', 'OCT': 'Oct', 'NOV': 'Nov', 'DEC': 'Dec'
+}
+
+def day_header_date(day_header):
+    """Inventory sheet date of a WPS day header, e.g. '3NOV' -> 'Nov 3'"""
+    day_num = ''.join(filter(str.isdigit, day_header))
+    month_abbr = ''.join(filter(str.isalpha, day_header))
+    return f"{MONTH_NAMES.get(month_abbr.upper(), month_abbr)} {day_num}"
+
+# --- WPS PLAN ---
+# Column A rows of the WPS that are section headers, not subrecipes
+WPS_EXCLUDE_TERMS = [
+    'hot kitchen', 'hot kitchen sauce', 'hot kitchen savory', 
+    'cold sauce', 'fabrication poultry', 'fabrication meats', 'pastry'
+]
+
+class WpsPlan:
+    """Subrecipes scheduled in the WPS (column A) with their batches per day (columns P-V)"""
+    __slots__ = ('table', 'day_headers', 'batches')
+
+    def __init__(self, table, day_headers, batches):
+        # Cells as entered, for display, and the same days as numbers (blank or text is 0)
+        self.table = table
+        self.day_headers = day_headers
+        self.batches = batches
+
+    def day_plan(self, day):
+        """Plan rows with batches on a day"""
+        return self.table[self.batches[:, day] > 0]
+
+def build_wps_plan(snapshot):
+    """Filtered WPS plan shared by the Weekly and Daily pages, or None if the WPS is too narrow"""
+    wps_df = snapshot.get('wps')
+    if wps_df is None or len(wps_df.columns) <= PLAN_DAYS:
+        return None
+
+    # Get the actual headers; the WPS dataset holds column A, then columns P-V
+    header_row = snapshot.get('wps_header_row')
+    day_headers = [header_row[i] if i < len(header_row) else f'Batch {i}' for i in range(1, PLAN_DAYS + 1)]
+
+    table = wps_df.iloc[:, :PLAN_DAYS + 1].copy()
+    table.columns = ['Subrecipe'] + day_headers
+
+    # Remove empty rows and section headers
+    names = table['Subrecipe']
+    keep = names.notna() & (names != '')
+    keep &= ~names.astype(str).str.strip().str.lower().isin(WPS_EXCLUDE_TERMS)
+    table = table[keep.to_numpy(dtype=bool)]
+
+    # A row is valid when any day is a positive number or text other than a zero
+    compact = table.iloc[:, 1:].apply(lambda column: cell_text(column).str.replace(' ', ''))
+    numbers = compact.apply(to_number)
+    # 'nan' parses as a number that is not positive, anything else unparseable counts as batches
+    nan_text = compact.apply(lambda column: column.str.lower()).isin(['nan', '+nan', '-nan'])
+    blank = (compact == '') | compact.apply(accounting_zero) | nan_text
+    valid = ~blank & (numbers.isna() | (numbers > 0))
+    valid_rows = valid.any(axis=1).to_numpy(dtype=bool)
+    table = table[valid_rows]
+
+    batches = numbers[valid_rows].fillna(0).to_numpy(dtype=float)
+    return WpsPlan(table, day_headers, batches)
+
+# --- PLAN CUBE ---
+class PlanCube:
+    """Raw material demand of the WPS plan per day and for the week, priced and typed, ready to slice"""
+    __slots__ = ('rm_type_options', 'materials', 'materials_by_type')
+
+    def __init__(self, rm_type_options, materials):
+        self.rm_type_options = rm_type_options
+        # One raw material frame per demand column, and the same frames split by type
+        self.materials = materials
+        self.materials_by_type = [
+            {rm_type: frame for rm_type, frame in column.groupby('rm_type', sort=False)}
+            for column in materials
+        ]
+
+    def materials_for(self, column, rm_type="All"):
+        """Raw materials of a demand column in order of first appearance, optionally of one type"""
+        if rm_type == "All":
+            return self.materials[column]
+        return self.materials_by_type[column].get(rm_type, self.materials[column].iloc[0:0])
+
+def build_plan_cube(snapshot):
+    """Demand cube of the WPS plan with type filter options, or None if there is no plan"""
+    wps_plan = snapshot.get('wps_plan')
+    if wps_plan is None:
+        return None
+
+    # Types of raw materials used by the plan, for the filter
+    recipe_rm_types = snapshot.get('recipe_rm_types')
+    all_rm_types = set()
+    for name in wps_plan.table['Subrecipe']:
+        all_rm_types.update(recipe_rm_types.get(name.strip().lower(), ()))
+    all_rm_types.add("FROZEN MEAT")
+    rm_type_options = ["All"] + sorted(list(all_rm_types))
+
+    # Demand of every day and the week in one product, then priced once per column
+    demand_cube = plan_demand(wps_plan.table['Subrecipe'], wps_plan.batches, snapshot.get('bom_matrix'))
+    raw_material_table = snapshot.get('raw_material_table')
+    materials = [demand_frame(demand_cube, column, raw_material_table) for column in range(PLAN_DAYS + 1)]
+    return PlanCube(rm_type_options, materials)
@@ -0,0 +1,140 @@
+"""Google Sheets access: one pooled client per process"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import gspread
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from .sources import DataSource, SourceUnavailableError, QuotaExceededError, pad_rows
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# --- CREDENTIALS ---
+CREDENTIAL_FIELDS = [
+    "type", "project_id", "private_key_id", "private_key", "client_email", "client_id",
+    "auth_uri", "token_uri", "auth_provider_x509_cert_url", "client_x509_cert_url",
+]
+
+def service_account_credentials(info):
+    """Service account credentials from a key's fields, as in the JSON key file or the app's secrets"""
+    credentials_dict = {field: info[field] for field in CREDENTIAL_FIELDS}
+    # Keys pasted into TOML secrets often carry escaped newlines
+    credentials_dict["private_key"] = credentials_dict["private_key"].replace('\\n', '\n')
+    return Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
+
+# --- SHARED SHEETS CLIENT ---
+@contextmanager
+def api_errors():
+    """Translate Google API failures into the data source errors the gateway retries"""
+    try:
+        yield
+    except (gspread.exceptions.APIError, requests.HTTPError) as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        if status == 429:
+            raise QuotaExceededError(str(e)) from e
+        if status is not None and status >= 500:
+            raise SourceUnavailableError(str(e)) from e
+        raise
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise SourceUnavailableError(str(e)) from e
+
+class SheetsClient(DataSource):
+    """Process-wide Google Sheets client with one keep-alive session and a cached spreadsheet handle"""
+
+    # Refresh the access token this long before it actually expires
+    TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+    def __init__(self, credentials, spreadsheet_id):
+        self.credentials = credentials
+        self.spreadsheet_id = spreadsheet_id
+        # One authorized session (connection pool with keep-alive) shared by every request
+        self.session = AuthorizedSession(credentials)
+        self.gc = gspread.Client(auth=credentials, session=self.session)
+        self._token_request = Request()
+        self._lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = None
+
+    def _ensure_token(self):
+        """Refresh the access token ahead of expiry so no request pays for the token exchange"""
+        with self._lock:
+            expiry = self.credentials.expiry
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if self.credentials.token and expiry and expiry - now > self.TOKEN_REFRESH_MARGIN:
+                return
+            self.credentials.refresh(self._token_request)
+
+    @property
+    def spreadsheet(self):
+        """Cached Spreadsheet handle, opened on first use"""
+        self._ensure_token()
+        with self._lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = self.gc.open_by_key(self.spreadsheet_id)
+            return self._spreadsheet
+
+    def _load_worksheets(self):
+        sh = self.spreadsheet
+        with self._lock:
+            if self._worksheets is None:
+                self._worksheets = sh.worksheets()
+            return self._worksheets
+
+    def worksheet(self, key):
+        """Get a worksheet by index (int) or title (str) without re-fetching spreadsheet metadata"""
+        for _ in range(2):
+            worksheets = self._load_worksheets()
+            if isinstance(key, int):
+                if 0 <= key < len(worksheets):
+                    return worksheets[key]
+            else:
+                for worksheet in worksheets:
+                    if worksheet.title == key:
+                        return worksheet
+            # Tabs may have been added, removed or reordered; reload the metadata once
+            self.invalidate()
+        raise gspread.exceptions.WorksheetNotFound(f"Worksheet {key!r} not found")
+
+    def batch_get_values(self, keys):
+        """Fetch the full grids of several worksheets in one values:batchGet request"""
+        with api_errors():
+            worksheets = [self.worksheet(key) for key in keys]
+            ranges = ["'{}'".format(worksheet.title.replace("'", "''")) for worksheet in worksheets]
+            response = self.spreadsheet.values_batch_get(ranges)
+        value_ranges = response.get('valueRanges', [])
+
+        return {key: pad_rows(value_range.get('values', [])) for key, value_range in zip(keys, value_ranges)}
+
+    def batch_get_ranges(self, ranges):
+        """Fetch only the given (worksheet key, A1 range) pairs, of any worksheets, in one values:batchGet request"""
+        with api_errors():
+            a1_ranges = [
+                "'{}'!{}".format(self.worksheet(key).title.replace("'", "''"), a1) for key, a1 in ranges
+            ]
+            response = self.spreadsheet.values_batch_get(a1_ranges)
+        value_ranges = response.get('valueRanges', [])
+
+        # Values as the API returns them: trailing blank cells and rows are left out
+        return {item: value_range.get('values', []) for item, value_range in zip(ranges, value_ranges)}
+
+    def get_revision(self):
+        """Spreadsheet version and modifiedTime from Drive, a tiny metadata-only request"""
+        with api_errors():
+            self._ensure_token()
+            response = self.session.get(
+                DRIVE_FILES_URL + self.spreadsheet_id,
+                params={'fields': 'version,modifiedTime', 'supportsAllDrives': 'true'}
+            )
+            response.raise_for_status()
+        return response.json()
+
+    def invalidate(self):
+        """Drop the cached spreadsheet handle and worksheet list"""
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = None
@@ -0,0 +1,627 @@
+"""Snapshots of every dataset for one download, their shared on-disk copy and the background refresher"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from types import MappingProxyType
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, every process refreshes on its own
+    fcntl = None
+from .layout import SPREADSHEET_ID
+from .sources import slice_range, join_ranges, download_ranges, SourceUnavailableError, QuotaExceededError
+from .datasets import DATASETS, DERIVED_DATASETS, PAGE_SOURCES, APP_RANGES, expand_dependencies
+from .perf import span, record_hit, recording, count_rows, resident_bytes
+
+# --- RAW SHEET CACHE ---
+class RawSheetCache:
+    """Raw values of the declared (worksheet, A1 range) pairs, keyed by spreadsheet id too, stored once per refresh"""
+
+    def __init__(self, spreadsheet_id, ranges=APP_RANGES):
+        self.spreadsheet_id = spreadsheet_id
+        # A range inside another declared range is cut from that one rather than downloaded again
+        self._covering = download_ranges(ranges)
+        self.ranges = list(dict.fromkeys(self._covering.values()))
+        # Snapshot version of the stored values; derived views are cached per version
+        self.version = None
+        self.fetched_at = None
+        self._values = {}
+
+    def store(self, values, version):
+        """Replace every range at once with a freshly downloaded set of self.ranges"""
+        stored = {}
+        for (worksheet, a1), (_, outer) in self._covering.items():
+            rows = values.get((worksheet, outer))
+            if rows is not None:
+                stored[(self.spreadsheet_id, worksheet, a1)] = rows if a1 == outer else slice_range(rows, a1, origin=outer)
+        self._values = stored
+        self.version = version
+        self.fetched_at = time.monotonic()
+
+    def values(self, worksheet, a1, spreadsheet_id=None):
+        """Cached values of a range, or None if it has not been downloaded yet"""
+        return self._values.get((spreadsheet_id or self.spreadsheet_id, worksheet, a1))
+
+def make_snapshot_version(revision, values):
+    """Snapshot version: the Drive revision plus a short digest of the downloaded values"""
+    items = sorted(([str(worksheet), a1], rows) for (worksheet, a1), rows in values.items())
+    payload = json.dumps(items, ensure_ascii=False).encode('utf-8')
+    digest = hashlib.blake2b(payload, digest_size=4).hexdigest()
+    return f"{revision or 'unknown'}-{digest}"
+
+# --- REFRESH CONTROLLER ---
+# Seconds between revision checks (a tiny Drive metadata request)
+REVISION_CHECK_SECONDS = 15
+# Re-download even when the revision has not moved, to pick up formula recalculations
+MAX_SNAPSHOT_AGE_SECONDS = 1800
+# Plain refresh interval used when the Drive revision cannot be read
+SHEET_REFRESH_SECONDS = 300
+# Seconds between checks of CURRENT by server processes that follow the one refreshing
+FOLLOW_CHECK_SECONDS = 2
+# Followers report the refreshing process as stopped once its status is this many intervals old
+STALLED_INTERVALS = 4
+
+class RefreshController:
+    """Re-downloads the declared ranges only when the spreadsheet revision moves"""
+
+    def __init__(self, client, raw_cache, check_seconds=REVISION_CHECK_SECONDS,
+                 max_age_seconds=MAX_SNAPSHOT_AGE_SECONDS):
+        self.client = client
+        self.raw_cache = raw_cache
+        self.check_seconds = check_seconds
+        self.max_age_seconds = max_age_seconds
+        self.revision = None
+        self.modified_time = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def _check_due(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.check_seconds
+
+    def _needs_download(self, revision):
+        if self.raw_cache.fetched_at is None:
+            return True
+        age = time.monotonic() - self.raw_cache.fetched_at
+        if revision is None:
+            return age >= SHEET_REFRESH_SECONDS
+        return revision != self.revision or age >= self.max_age_seconds
+
+    def poll(self):
+        """Check the revision if due and re-download the grids if it moved; returns the snapshot version"""
+        if self.client is None or not self._check_due():
+            return self.raw_cache.version
+        with self._lock:
+            # Another session may have checked while we were waiting for the lock
+            if not self._check_due():
+                return self.raw_cache.version
+
+            try:
+                with span('sheets:revision'):
+                    metadata = self.client.get_revision()
+            except (SourceUnavailableError, QuotaExceededError):
+                # Outage or throttling: a failed refresh, even while the grids are too recent to re-download
+                raise
+            except Exception:
+                # Drive metadata unreadable (no Drive access, 403/404): fall back to the plain refresh interval
+                metadata = {}
+            revision = metadata.get('version') or metadata.get('modifiedTime')
+
+            if self._needs_download(revision):
+                with span('sheets:download') as download:
+                    values = self.client.batch_get_ranges(self.raw_cache.ranges)
+                    download.rows = sum(len(rows) for rows in values.values())
+                self.raw_cache.store(values, make_snapshot_version(revision, values))
+                self.revision = revision
+                self.modified_time = metadata.get('modifiedTime')
+            self.checked_at = time.monotonic()
+        return self.raw_cache.version
+
+# Every session reads the same snapshot; with Copy-on-Write (always on from pandas 3) a frame view handed to
+# a page shares the data until the page modifies it, and then only the page's view is copied
+PANDAS_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+def copy_on_write():
+    """Whether pandas copies a shared frame's data on write; before pandas 3 only if the caller turned it on"""
+    return PANDAS_COPY_ON_WRITE or pd.get_option('mode.copy_on_write') is True
+
+def enable_copy_on_write():
+    """Turn on Copy-on-Write for pandas before 3, so Snapshot.get hands out views rather than copies"""
+    if not PANDAS_COPY_ON_WRITE:
+        pd.set_option('mode.copy_on_write', True)
+
+def freeze(value):
+    """Read-only form of a newly built dataset: arrays locked, lists as tuples, dicts behind a read-only proxy"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, list):
+        return tuple(value)
+    elif isinstance(value, dict):
+        return MappingProxyType(value)
+    elif hasattr(type(value), '__slots__'):
+        # Records such as the BOM matrix and the WPS plan: lock their arrays
+        for slot in type(value).__slots__:
+            item = getattr(value, slot, None)
+            if isinstance(item, np.ndarray):
+                item.setflags(write=False)
+    return value
+
+def shared_view(value):
+    """What a page gets for a dataset: the shared object itself, or for a frame a zero-copy Copy-on-Write view
+    (a copy without Copy-on-Write, so a page cannot modify the shared frame)"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=not copy_on_write())
+    return value
+
+def stamp_snapshot_version(df, snapshot_version):
+    """Record the snapshot version a dataset was derived from"""
+    df.attrs['snapshot_version'] = snapshot_version
+    return df
+
+# --- SNAPSHOTS ---
+class Snapshot:
+    """Datasets from one set of raw grids, tagged with their snapshot version, built on first use and then
+    shared read-only by every session: reruns get references, never copies"""
+
+    def __init__(self, version, fetched_at, source, loaders):
+        self.version = version
+        # UTC time the underlying grids were downloaded from Google Sheets
+        self.fetched_at = fetched_at
+        # 'sheets' for a live download, 'disk' for a snapshot restored from SNAPSHOT_DIR
+        self.source = source
+        # Dataset name -> zero-argument callable that builds it
+        self._loaders = dict(loaders)
+        for name, spec in DERIVED_DATASETS.items():
+            self._loaders[name] = partial(spec.build, self)
+        self._datasets = {}
+        # Re-entrant: derived datasets get their sources while being built
+        self._lock = threading.RLock()
+
+    @property
+    def age_seconds(self):
+        return (datetime.now(timezone.utc) - self.fetched_at).total_seconds()
+
+    def has(self, name):
+        return name in self._datasets or name in self._loaders
+
+    def materialized(self):
+        """Names of the datasets built so far"""
+        return list(self._datasets)
+
+    def memory_report(self):
+        """Resident bytes of each dataset built so far; memory shared between datasets counts once, for the first"""
+        seen = set()
+        return {name: resident_bytes(value, seen) for name, value in list(self._datasets.items())}
+
+    def get(self, name):
+        """Dataset by name, built on first use; None if this snapshot cannot provide it"""
+        if name in self._datasets:
+            value = self._datasets[name]
+            record_hit(f'dataset:{name}', count_rows(value))
+            return shared_view(value)
+        with self._lock:
+            if name not in self._datasets:
+                loader = self._loaders.get(name)
+                if loader is None:
+                    return None
+                with span(f'dataset:{name}', cache='miss') as build:
+                    value = loader()
+                    build.rows = count_rows(value)
+                if isinstance(value, pd.DataFrame):
+                    stamp_snapshot_version(value, self.version)
+                self._datasets[name] = freeze(value)
+            return shared_view(self._datasets[name])
+
+def _parse_dataset(spec, blocks):
+    """Parse a dataset from the values of its ranges side by side; empty until they are downloaded"""
+    grid = [] if any(block is None for block in blocks) else join_ranges(blocks, spec.ranges)
+    return spec.parse(grid)
+
+def build_snapshot(raw_cache):
+    """Snapshot over the raw grid cache; datasets are parsed lazily, once per snapshot version"""
+    loaders = {
+        name: partial(_parse_dataset, spec, [raw_cache.values(spec.sheet, a1) for a1 in spec.ranges])
+        for name, spec in DATASETS.items()
+    }
+    return Snapshot(raw_cache.version, datetime.now(timezone.utc), 'sheets', loaders)
+
+def snapshot_from_grids(grids, revision=None):
+    """Snapshot over full worksheet grids ({worksheet index: rows}) supplied directly, without Google Sheets"""
+    raw_cache = RawSheetCache(SPREADSHEET_ID)
+    values = {(worksheet, a1): slice_range(grids.get(worksheet, []), a1) for worksheet, a1 in raw_cache.ranges}
+    raw_cache.store(values, make_snapshot_version(revision, values))
+    return build_snapshot(raw_cache)
+
+# --- SHARED ON-DISK SNAPSHOT ---
+SNAPSHOT_DIR = Path(os.environ.get('SRGUIDE_SNAPSHOT_DIR', Path(__file__).resolve().parent.parent / '.snapshot'))
+
+class SnapshotStore:
+    """Last good snapshot as one Arrow IPC file per dataset, memory-mapped read-only by every server process.
+
+    Each save goes to a new folder (files plus manifest); the CURRENT file names the live folder and is
+    replaced atomically, so a reader sees the previous snapshot or the new one, never a mix.
+    """
+
+    CURRENT = 'CURRENT'
+    MANIFEST = 'manifest.json'
+    STATUS = 'status.json'
+    # Bumped when the layout of the saved datasets changes; snapshots in another format are ignored
+    FORMAT = 5
+    # Snapshot folders kept on disk, so a reader of the previous one is not cut off mid-load
+    KEEP_FOLDERS = 2
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        # Version, folder and dataset names most recently written or read
+        self.version = None
+        self.folder = None
+        self.saved = set()
+
+    def save(self, snapshot):
+        """Write the materialized datasets to a new folder, then atomically repoint CURRENT at it"""
+        names = [name for name in snapshot.materialized() if name in DATASETS]
+        if snapshot.version == self.version and set(names) <= self.saved:
+            return
+        with span('snapshot:save', rows=len(names)):
+            self._write(snapshot, names)
+
+    def _write(self, snapshot, names):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        folder = f"{time.time_ns()}-{hashlib.blake2b(str(snapshot.version).encode(), digest_size=4).hexdigest()}"
+        target = self.directory / folder
+        target.mkdir()
+
+        # Version header of every file, checked when it is mapped
+        header = {b'srguide_format': str(self.FORMAT).encode(), b'srguide_version': str(snapshot.version).encode()}
+        columns = {}
+        rows = {}
+        for name in names:
+            value = snapshot.get(name)
+            if isinstance(value, pd.DataFrame):
+                # Sheet headers can be blank or repeated, so store columns by position
+                columns[name] = [str(column) for column in value.columns]
+                self._write_frame(target / f'{name}.arrow', value, header)
+            else:
+                rows[name] = list(value)
+
+        manifest = {
+            'format': self.FORMAT,
+            'version': snapshot.version,
+            'fetched_at': snapshot.fetched_at.isoformat(),
+            'columns': columns,
+            'rows': rows,
+        }
+        (target / self.MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+        current_tmp = self.directory / f'{self.CURRENT}.{os.getpid()}.tmp'
+        current_tmp.write_text(folder, encoding='utf-8')
+        os.replace(current_tmp, self.directory / self.CURRENT)
+        self.version = snapshot.version
+        self.folder = folder
+        self.saved = set(names)
+
+        # Remove folders of older snapshots; processes still mapping them keep their pages until they swap
+        folders = sorted((path for path in self.directory.iterdir() if path.is_dir()), key=lambda path: path.name)
+        for path in folders[:-self.KEEP_FOLDERS]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _write_frame(path, df, header):
+        positional = df.set_axis([f'c{i}' for i in range(len(df.columns))], axis=1)
+        table = pa.Table.from_pandas(positional, preserve_index=False)
+        # Float columns keep NaN rather than nulls, so readers get them straight from the mapped file
+        for position, (name, column) in enumerate(positional.items()):
+            if column.dtype == np.float64:
+                table = table.set_column(position, name, pa.array(column.to_numpy(), from_pandas=False))
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **header})
+        # Uncompressed, so the mapped file is the data
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    @staticmethod
+    def _map_table(path, version):
+        """Memory-map a dataset file; its pages are shared by every process mapping the same snapshot"""
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        file_version = (table.schema.metadata or {}).get(b'srguide_version', b'').decode()
+        if file_version != str(version):
+            raise ValueError(f"{path.name} belongs to snapshot {file_version or 'unknown'}, expected {version}")
+        return table
+
+    @staticmethod
+    def _frame(table, columns):
+        # Only floats, integers without nulls and (from pandas 3, where it stays Arrow) text remain views of the
+        # mapped file. Categories, which include every key column, integers with nulls and, before pandas 3, text
+        # are copied into this process on first use, so most of a follower's frames are its own memory
+        df = table.to_pandas(split_blocks=True)
+        df.columns = columns
+        return df
+
+    def current_folder(self):
+        """Folder CURRENT points at, or None before the first save"""
+        try:
+            return (self.directory / self.CURRENT).read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def changed(self):
+        """Whether CURRENT points at a snapshot other than the one this process last read or wrote"""
+        folder = self.current_folder()
+        return folder is not None and folder != self.folder
+
+    def load(self, source='disk'):
+        """Map the current snapshot, or None if there is none; frames are converted on first use"""
+        folder_name = self.current_folder()
+        if folder_name is None:
+            return None
+        folder = self.directory / folder_name
+        try:
+            manifest = json.loads((folder / self.MANIFEST).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            # Replaced and removed between reading CURRENT and its manifest; the next check picks up the new one
+            return None
+        if manifest.get('format') != self.FORMAT:
+            return None
+
+        # Mapped now, so the files stay readable even after a later save removes the folder
+        loaders = {}
+        for name, columns in manifest['columns'].items():
+            table = self._map_table(folder / f'{name}.arrow', manifest['version'])
+            loaders[name] = partial(self._frame, table, columns)
+        for name, row in manifest['rows'].items():
+            loaders[name] = partial(list, row)
+
+        self.version = manifest['version']
+        self.folder = folder_name
+        self.saved = set(loaders)
+        fetched_at = datetime.fromisoformat(manifest['fetched_at'])
+        return Snapshot(manifest['version'], fetched_at, source, loaders)
+
+    def save_status(self, status):
+        """Publish the refreshing process's status (errors, quota) for the processes that only read"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        status_tmp = self.directory / f'{self.STATUS}.{os.getpid()}.tmp'
+        status_tmp.write_text(json.dumps(status, default=str), encoding='utf-8')
+        os.replace(status_tmp, self.directory / self.STATUS)
+
+    def load_status(self):
+        """Status last published by the refreshing process, or None"""
+        try:
+            return json.loads((self.directory / self.STATUS).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return None
+
+class SnapshotLease:
+    """Lock file in the snapshot directory: the process holding it is the one that talks to Google Sheets.
+
+    The OS drops the lock when its holder exits, so another server process takes over. Without fcntl
+    (Windows) every process holds its own lease, as with a single server.
+    """
+
+    LOCK = 'refresh.lock'
+
+    def __init__(self, directory):
+        self.path = Path(directory) / self.LOCK
+        self.held = False
+        self._file = None
+
+    def acquire(self):
+        """Take the lease if no other process holds it; True while this process holds it"""
+        if self.held:
+            return True
+        if fcntl is None:
+            self.held = True
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        self.held = True
+        return True
+
+# --- BACKGROUND REFRESHER ---
+class SnapshotRefresher:
+    """Background worker that rebuilds the snapshot ahead of reruns and swaps it in atomically.
+
+    With a lease, only the server process holding it downloads and saves; the others follow by mapping
+    each snapshot it saves, so N processes make one upstream fetch and one parse, and share the columns that
+    stay in the mapped files (see SnapshotStore._frame).
+    Without a controller it only ever follows, as the app does when the sync process (srcore.sync) owns
+    every Google Sheets read.
+    """
+
+    def __init__(self, controller, store, interval=REVISION_CHECK_SECONDS, lease=None,
+                 follow_interval=FOLLOW_CHECK_SECONDS):
+        self.controller = controller
+        self.store = store
+        self.interval = interval
+        self.lease = lease
+        self.follow_interval = follow_interval
+        self.snapshot = None
+        # Datasets any page has asked for; built ahead of time on every refresh
+        self.wanted = set()
+        # Refresh status, read by the pages
+        self.last_success_at = None
+        self.last_error = None
+        self.last_error_at = None
+        self.consecutive_failures = 0
+        # Status published by the leading process (or by this one, while it leads)
+        self.status = None
+        self._lock = threading.Lock()
+        self._first_attempt = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Restore the saved snapshot, then start the refresh loop"""
+        try:
+            self.snapshot = self.store.load()
+            if self.snapshot is not None:
+                # Pages served from the saved datasets before the restart will need them again
+                self.wanted.update(self.store.saved)
+                self.wanted.update(
+                    name for name in DERIVED_DATASETS
+                    if all(source in self.store.saved for source in expand_dependencies([name]) if source in DATASETS)
+                )
+        except Exception as e:
+            self._record_error(e)
+        self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def reader(self):
+        """Whether this process never talks to Google Sheets and only maps what another process saves"""
+        return self.controller is None
+
+    @property
+    def leader(self):
+        """Whether this process downloads from Google Sheets (always, without a lease)"""
+        return not self.reader and (self.lease is None or self.lease.held)
+
+    def require(self, names):
+        """Record datasets a page reads so later refreshes build them before swapping"""
+        self.wanted.update(expand_dependencies(names))
+
+    def _record_error(self, error):
+        with self._lock:
+            self.last_error = error
+            self.last_error_at = datetime.now(timezone.utc)
+            self.consecutive_failures += 1
+
+    def _record_success(self):
+        with self._lock:
+            self.last_success_at = datetime.now(timezone.utc)
+            self.last_error = None
+            self.consecutive_failures = 0
+
+    def _materialize(self, snapshot):
+        for name in expand_dependencies(list(self.wanted)):
+            snapshot.get(name)
+
+    def refresh(self):
+        """Lead or follow: poll Google Sheets, or map the snapshot the leading process saved"""
+        with recording('refresh'):
+            self._refresh()
+
+    def _refresh(self):
+        leading = not self.reader and (self.lease is None or self.lease.acquire())
+        try:
+            if leading:
+                if self.lease is not None:
+                    # Followers derive their pages' datasets from what is saved, so parse and save every sheet a
+                    # page reads, whether or not a page in this process has asked for it yet
+                    self.wanted.update(PAGE_SOURCES)
+                self._lead()
+                self._record_success()
+            else:
+                self._follow()
+        except Exception as e:
+            self._record_error(e)
+        if leading and self.lease is not None:
+            self._publish_status()
+        # A follower keeps cold-starting pages waiting until the leader has saved a first snapshot or failed
+        if leading or self.snapshot is not None or self.last_error is not None:
+            self._first_attempt.set()
+
+    def _publish_status(self):
+        """Save this process's refresh status next to the snapshot, for the followers' pages"""
+        error = self.last_error
+        stats = getattr(self.controller.client, 'stats', None)
+        status = {
+            'pid': os.getpid(),
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+            'interval': self.interval,
+            'version': self.snapshot.version if self.snapshot is not None else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'error': str(error) if error is not None else None,
+            'quota_exceeded': isinstance(error, QuotaExceededError),
+            'consecutive_failures': self.consecutive_failures,
+            'quota': stats() if callable(stats) else None,
+        }
+        try:
+            self.store.save_status(status)
+        except OSError:
+            # Followers then report the leader as stalled; the snapshot itself was saved or kept
+            pass
+        self.status = status
+
+    def _follow(self):
+        """Swap in the snapshot the leading process saved last, if this process does not have it yet"""
+        current = self.snapshot
+        if current is None or current.source != 'shared' or self.store.changed():
+            with span('snapshot:load'):
+                snapshot = self.store.load(source='shared')
+            if snapshot is not None:
+                self._materialize(snapshot)
+                with self._lock:
+                    self.snapshot = snapshot
+        self._apply_status(self.store.load_status())
+
+    def _apply_status(self, status):
+        """Take over the leading process's refresh status, so the pages warn as if this process refreshed"""
+        if status is None:
+            # No process has refreshed yet; the pages wait for the first snapshot
+            if self.snapshot is not None:
+                self._record_success()
+            return
+        self.status = status
+        now = datetime.now(timezone.utc)
+        age = (now - datetime.fromisoformat(status['updated_at'])).total_seconds()
+        if age > STALLED_INTERVALS * max(status.get('interval') or 0, self.follow_interval):
+            error = SourceUnavailableError(f"the sync process has not reported for {int(age)}s")
+        elif status.get('error'):
+            error_type = QuotaExceededError if status.get('quota_exceeded') else SourceUnavailableError
+            error = error_type(status['error'])
+        else:
+            error = None
+        with self._lock:
+            self.last_error = error
+            self.consecutive_failures = status.get('consecutive_failures', 0)
+            if error is None:
+                self.last_success_at = now
+            else:
+                self.last_error_at = now
+
+    def _lead(self):
+        """Poll the controller and swap in a new snapshot when the grids changed"""
+        version = self.controller.poll()
+        current = self.snapshot
+        if version is not None and (current is None or current.source != 'sheets' or current.version != version):
+            snapshot = build_snapshot(self.controller.raw_cache)
+            # Build what the pages read before the swap, so no rerun pays for parsing
+            self._materialize(snapshot)
+            with self._lock:
+                self.snapshot = snapshot
+            self.store.save(snapshot)
+        elif current is not None and current.source == 'sheets':
+            # A page needed a dataset the saved snapshot does not have yet
+            self._materialize(current)
+            self.store.save(current)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval if self.leader else self.follow_interval)
+
+    def current(self):
+        """Current in-memory snapshot; never touches the network"""
+        return self.snapshot
+
+    def wait_for_snapshot(self, timeout):
+        """Wait for the first refresh attempt, for a cold start or a dataset missing from the saved snapshot"""
+        self._first_attempt.wait(timeout)
+        return self.snapshot
@@ -0,0 +1,222 @@
+"""Data sources the refresh controller reads from: Google Sheets, or local fixtures for offline runs"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+class DataSource:
+    """Worksheet grids plus a cheap revision check; SheetsClient and LocalSheetsSource implement it"""
+
+    def get_revision(self):
+        """Metadata with a 'version' and/or 'modifiedTime' that changes whenever the data does"""
+        raise NotImplementedError
+
+    def batch_get_values(self, keys):
+        """Full grids {worksheet key: rows} of several worksheets in one request"""
+        raise NotImplementedError
+
+    def batch_get_ranges(self, ranges):
+        """Values {(worksheet key, A1 range): rows} of several ranges in one request, trimmed as the Sheets API does"""
+        grids = self.batch_get_values(list(dict.fromkeys(key for key, _ in ranges)))
+        return {(key, a1): slice_range(grids[key], a1) for key, a1 in ranges}
+
+    def invalidate(self):
+        """Drop any cached handles; called after the worksheet layout may have changed"""
+
+class SourceUnavailableError(Exception):
+    """Transient failure of a data source (network error, 5xx)"""
+
+class QuotaExceededError(Exception):
+    """The data source rejected a request for exceeding its rate quota (HTTP 429)"""
+
+def pad_rows(rows):
+    """Pad ragged rows to the same width, the way get_all_values() does"""
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [''] * (width - len(row)) for row in rows]
+
+# --- A1 RANGES ---
+A1_PATTERN = re.compile(r'([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?')
+
+def column_index(letters):
+    """Zero-based index of a column letter such as 'A' or 'AB'"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def parse_a1(a1):
+    """(first row, last row, first column, last column), zero-based and inclusive; None for an open end"""
+    match = A1_PATTERN.fullmatch(a1.upper())
+    if match is None or not any(match.groups()):
+        raise ValueError(f"Unsupported A1 range {a1!r}")
+    first_col, first_row, last_col, last_row = match.groups()
+    first = (int(first_row) - 1 if first_row else 0, column_index(first_col) if first_col else 0)
+    if ':' not in a1:
+        # A single cell
+        return first[0], first[0], first[1], first[1]
+    last_row = int(last_row) - 1 if last_row else None
+    last_col = column_index(last_col) if last_col else None
+    return first[0], last_row, first[1], last_col
+
+def range_width(a1):
+    """Columns spanned by an A1 range, or None if it is open to the right"""
+    _, _, first_col, last_col = parse_a1(a1)
+    return None if last_col is None else last_col - first_col + 1
+
+def slice_range(grid, a1, origin='A1'):
+    """Values of an A1 range of a grid whose top-left cell is `origin`, with trailing blank cells and rows
+    dropped as the Sheets API does"""
+    first_row, last_row, first_col, last_col = parse_a1(a1)
+    origin_row, _, origin_col, _ = parse_a1(origin)
+    first_row -= origin_row
+    first_col -= origin_col
+    rows = grid[first_row:None if last_row is None else last_row - origin_row + 1]
+    values = []
+    for row in rows:
+        cells = list(row[first_col:None if last_col is None else last_col - origin_col + 1])
+        while cells and cells[-1] == '':
+            cells.pop()
+        values.append(cells)
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+def contains_range(outer, inner):
+    """True if the A1 range `outer` covers every cell of `inner`"""
+    outer_first_row, outer_last_row, outer_first_col, outer_last_col = parse_a1(outer)
+    first_row, last_row, first_col, last_col = parse_a1(inner)
+    def covers(first, last, outer_first, outer_last):
+        return outer_first <= first and (outer_last is None or (last is not None and last <= outer_last))
+    return (covers(first_row, last_row, outer_first_row, outer_last_row)
+            and covers(first_col, last_col, outer_first_col, outer_last_col))
+
+def download_ranges(ranges):
+    """Each (worksheet, A1 range) mapped to the range downloaded for it: itself, or the widest range covering it"""
+    ranges = list(dict.fromkeys(ranges))
+    def covered(worksheet, a1):
+        return [other for other_worksheet, other in ranges
+                if other_worksheet == worksheet and other != a1 and contains_range(other, a1)]
+    outermost = [(worksheet, a1) for worksheet, a1 in ranges if not covered(worksheet, a1)]
+    return {
+        (worksheet, a1): next(
+            (worksheet, other) for other_worksheet, other in outermost
+            if other_worksheet == worksheet and (other == a1 or contains_range(other, a1))
+        )
+        for worksheet, a1 in ranges
+    }
+
+def join_ranges(blocks, ranges):
+    """Side-by-side grid of the values of several ranges of one worksheet, in the order declared.
+
+    Ranges are padded to their declared width so columns keep their position. The last range adds no
+    columns when it came back empty, so a sheet too narrow to reach it shows up as a narrower grid;
+    a single range is as wide as its widest row, like a whole-sheet read.
+    """
+    if len(blocks) == 1:
+        return pad_rows(blocks[0])
+    height = max((len(block) for block in blocks), default=0)
+    grid = [[] for _ in range(height)]
+    for position, (block, a1) in enumerate(zip(blocks, ranges)):
+        width = range_width(a1)
+        if width is None or (position == len(blocks) - 1 and not block):
+            width = max((len(row) for row in block), default=0)
+        for index in range(height):
+            row = block[index][:width] if index < len(block) else []
+            grid[index].extend(list(row) + [''] * (width - len(row)))
+    return grid
+
+def write_fixture(path, grids, revision='1'):
+    """Save worksheet grids {worksheet index: rows} as a JSON fixture"""
+    fixture = {'revision': str(revision), 'worksheets': {str(key): rows for key, rows in grids.items()}}
+    Path(path).write_text(json.dumps(fixture, ensure_ascii=False), encoding='utf-8')
+
+def read_fixture(path):
+    """Worksheet grids and revision from a JSON fixture written by write_fixture()"""
+    fixture = json.loads(Path(path).read_text(encoding='utf-8'))
+    grids = {int(key) if key.isdigit() else key: rows for key, rows in fixture['worksheets'].items()}
+    return grids, fixture.get('revision', '1')
+
+class LocalSheetsSource(DataSource):
+    """In-process stand-in for the spreadsheet, serving fixture grids with injected latency, errors and quota"""
+
+    def __init__(self, grids, revision='1', latency=0.0, jitter=0.0, error_rate=0.0, quota_rate=0.0, seed=0):
+        self._grids = dict(grids)
+        self.revision = str(revision)
+        self.modified_time = None
+        # Seconds added to every request, plus up to `jitter` more
+        self.latency = latency
+        self.jitter = jitter
+        # Probability of a request failing with SourceUnavailableError / QuotaExceededError
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        # Request counts by method, for call accounting in benchmarks
+        self.calls = {'get_revision': 0, 'batch_get_values': 0, 'batch_get_ranges': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._touch()
+
+    @classmethod
+    def from_fixture(cls, path, **options):
+        grids, revision = read_fixture(path)
+        return cls(grids, revision, **options)
+
+    def _touch(self):
+        self.modified_time = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+
+    def _request(self, method):
+        with self._lock:
+            self.calls[method] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            draw = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if draw < self.quota_rate:
+            raise QuotaExceededError(f"{method}: quota exceeded (injected)")
+        if draw < self.quota_rate + self.error_rate:
+            raise SourceUnavailableError(f"{method}: service unavailable (injected)")
+
+    def get_revision(self):
+        self._request('get_revision')
+        return {'version': self.revision, 'modifiedTime': self.modified_time}
+
+    def batch_get_values(self, keys):
+        self._request('batch_get_values')
+        grids = self._grids
+        missing = [key for key in keys if key not in grids]
+        if missing:
+            raise KeyError(f"Worksheets {missing!r} not in the fixture")
+        return {key: pad_rows(grids[key]) for key in keys}
+
+    def batch_get_ranges(self, ranges):
+        self._request('batch_get_ranges')
+        grids = self._grids
+        missing = [key for key, _ in ranges if key not in grids]
+        if missing:
+            raise KeyError(f"Worksheets {missing!r} not in the fixture")
+        return {(key, a1): slice_range(grids[key], a1) for key, a1 in ranges}
+
+    def update(self, grids, revision=None):
+        """Replace some worksheets, as an edit of the spreadsheet would, and move the revision"""
+        with self._lock:
+            self._grids = {**self._grids, **grids}
+            if revision is None:
+                revision = int(self.revision) + 1 if self.revision.isdigit() else f"{self.revision}.1"
+            self.revision = str(revision)
+            self._touch()
+
+def source_from_env(environ=None):
+    """LocalSheetsSource for SRGUIDE_FIXTURE (plus the _LATENCY, _JITTER, _ERROR_RATE and _QUOTA_RATE
+    options), or None to use Google Sheets"""
+    environ = os.environ if environ is None else environ
+    path = environ.get('SRGUIDE_FIXTURE')
+    if not path:
+        return None
+    options = {}
+    for option in ('latency', 'jitter', 'error_rate', 'quota_rate'):
+        value = environ.get(f'SRGUIDE_FIXTURE_{option.upper()}')
+        if value:
+            options[option] = float(value)
+    return LocalSheetsSource.from_fixture(path, **options)
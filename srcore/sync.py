@@ -0,0 +1,115 @@
+"""Sync process: the one process that reads Google Sheets. It refreshes on the usual schedule and publishes
+each new snapshot, with its refresh status, to the snapshot directory the app maps.
+
+    python -m srcore.sync                                    # key from .streamlit/secrets.toml
+    python -m srcore.sync --credentials service-account.json
+    SRGUIDE_FIXTURE=fixture.json python -m srcore.sync       # local fake spreadsheet, for tests
+    python -m srcore.sync --once                             # one refresh, then exit
+
+Run the app with SRGUIDE_SYNC=daemon so it is a pure reader: it never opens a connection to Google, it maps
+whatever this process last published. Without it the app refreshes in its own process, as on single-process hosts.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+from pathlib import Path
+from .layout import SPREADSHEET_ID
+from .sources import source_from_env
+from .gateway import SheetsGateway
+from .datasets import PAGE_SOURCES
+from .perf import configure_perf_log
+from .snapshot import (
+    REVISION_CHECK_SECONDS, SNAPSHOT_DIR, RawSheetCache, RefreshController, SnapshotStore, SnapshotLease,
+    SnapshotRefresher,
+)
+try:
+    import tomllib
+except ImportError:
+    # Python < 3.11: pass a JSON key file instead of the secrets file
+    tomllib = None
+
+logger = logging.getLogger('srcore.sync')
+
+# The app's Streamlit secrets, so the daemon runs off the same key without another copy
+SECRETS_FILE = Path('.streamlit') / 'secrets.toml'
+SECRETS_SECTION = 'google_credentials2'
+
+def read_credentials_info(path=None):
+    """Service account key fields from a JSON key file, or from the [google_credentials2] secrets section"""
+    path = Path(path or os.environ.get('GOOGLE_APPLICATION_CREDENTIALS') or SECRETS_FILE)
+    if path.suffix == '.json':
+        return json.loads(path.read_text(encoding='utf-8'))
+    if tomllib is None:
+        raise RuntimeError(f"Reading {path} needs Python 3.11+; pass a JSON key file with --credentials")
+    return tomllib.loads(path.read_text(encoding='utf-8'))[SECRETS_SECTION]
+
+def make_source(credentials_path=None):
+    """The local fake spreadsheet named by SRGUIDE_FIXTURE, otherwise Google Sheets, behind the quota gateway"""
+    source = source_from_env()
+    if source is None:
+        from .sheets import SheetsClient, service_account_credentials
+        source = SheetsClient(service_account_credentials(read_credentials_info(credentials_path)), SPREADSHEET_ID)
+    return SheetsGateway(source)
+
+def make_refresher(source, directory=SNAPSHOT_DIR, interval=REVISION_CHECK_SECONDS):
+    """Refresher that leads on the snapshot directory and saves every sheet a page reads"""
+    refresher = SnapshotRefresher(
+        RefreshController(source, RawSheetCache(SPREADSHEET_ID)), SnapshotStore(directory),
+        interval=interval, lease=SnapshotLease(directory)
+    )
+    # Readers derive each page's datasets from the saved sheets
+    refresher.require(PAGE_SOURCES)
+    return refresher
+
+def describe(refresher):
+    """One log line for the refresher's state"""
+    if not refresher.leader:
+        return "another process holds the refresh lease; following it"
+    snapshot = refresher.snapshot
+    line = f"snapshot {snapshot.version} ({snapshot.source})" if snapshot is not None else "no snapshot yet"
+    if refresher.last_error is not None:
+        line += f"; refresh failed {refresher.consecutive_failures}x: {refresher.last_error}"
+    return line
+
+def run(refresher, stop):
+    """Refresh in the background until `stop` is set, logging each change of state"""
+    refresher.start()
+    last = None
+    while not stop.wait(1):
+        line = describe(refresher)
+        if line != last:
+            (logger.warning if refresher.last_error is not None else logger.info)(line)
+            last = line
+    refresher.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--credentials', type=Path, help='service account JSON key or secrets.toml (default: GOOGLE_APPLICATION_CREDENTIALS, then .streamlit/secrets.toml)')
+    parser.add_argument('--snapshot-dir', type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument('--interval', type=float, default=REVISION_CHECK_SECONDS, help='seconds between revision checks')
+    parser.add_argument('--once', action='store_true', help='refresh and publish once, then exit')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    logger.setLevel(args.log_level.upper())
+    # Refresh timings go to SRGUIDE_PERF_LOG, as in the app
+    configure_perf_log(os.environ.get('SRGUIDE_PERF_LOG'))
+
+    refresher = make_refresher(make_source(args.credentials), args.snapshot_dir, args.interval)
+    if args.once:
+        refresher.refresh()
+        logger.info(describe(refresher))
+        return 0 if refresher.leader and refresher.last_error is None else 1
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    logger.info(f"syncing spreadsheet {SPREADSHEET_ID} into {args.snapshot_dir} every {args.interval:g}s")
+    run(refresher, stop)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,10 +1,41 @@
+import os
+from functools import wraps
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from srcore import (
+    SPREADSHEET_ID,
+    DATASETS,
+    PAGE_DATASETS,
+    WEEK_COLUMN,
+    SheetsClient,
+    service_account_credentials,
+    SheetsGateway,
+    QuotaExceededError,
+    source_from_env,
+    RawSheetCache,
+    RefreshController,
+    SnapshotStore,
+    SnapshotLease,
+    SNAPSHOT_DIR,
+    SnapshotRefresher,
+    expand_dependencies,
+    day_header_date,
+    span,
+    current_recorder,
+    start_recording,
+    finish_recording,
+    configure_perf_log,
+    enable_copy_on_write,
+)
 import warnings
 warnings.filterwarnings('ignore')
 
+# Pages get zero-copy views of the shared snapshot's frames under Copy-on-Write (always on from pandas 3)
+enable_copy_on_write()
+
+# Partial reruns of a page section; older Streamlit releases only have the experimental name
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
 # Set page configuration
 st.set_page_config(
     page_title="Subrecipe Guide",
@@ -267,1267 +298,622 @@ def load_credentials():
             st.error("Google credentials not found in secrets")
             return None
 
-        credentials_dict = {
-            "type": st.secrets["google_credentials2"]["type"],
-            "project_id": st.secrets["google_credentials2"]["project_id"],
-            "private_key_id": st.secrets["google_credentials2"]["private_key_id"],
-            "private_key": st.secrets["google_credentials2"]["private_key"].replace('\\n', '\n'),
-            "client_email": st.secrets["google_credentials2"]["client_email"],
-            "client_id": st.secrets["google_credentials2"]["client_id"],
-            "auth_uri": st.secrets["google_credentials2"]["auth_uri"],
-            "token_uri": st.secrets["google_credentials2"]["token_uri"],
-            "auth_provider_x509_cert_url": st.secrets["google_credentials2"]["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": st.secrets["google_credentials2"]["client_x509_cert_url"]
-        }
-
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
+        credentials = service_account_credentials(st.secrets["google_credentials2"])
         return credentials
 
     except Exception as e:
         st.error(f"Error loading credentials: {str(e)}")
         return None
 
-# --- LOAD SUBRECIPE OPTIONS ---
-@st.cache_data(ttl=300)
-def load_subrecipe_data():
-    """Load subrecipe data from sheet index 1"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
+# --- SHARED RESOURCES ---
+# Who reads Google Sheets: 'embedded' (default) refreshes on a background thread in the server process;
+# 'daemon' leaves it to the sync process (python -m srcore.sync) and only maps the snapshots it publishes
+SYNC_MODE = os.environ.get('SRGUIDE_SYNC', 'embedded')
 
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 1 (second sheet)
-        worksheet = sh.get_worksheet(1)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 2:
-            st.warning("Not enough data in sheet index 1")
-            return pd.DataFrame()
-
-        # Create DataFrame with headers from first row
-        df = pd.DataFrame(data[1:], columns=data[0])
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        # Add normalized column for case-insensitive matching
-        if len(df.columns) > 0:
-            df['_normalized_name'] = df.iloc[:, 0].str.strip().str.lower()
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading subrecipe data: {str(e)}")
-        return pd.DataFrame()
-
-# --- LOAD BATCH DATA ---
-@st.cache_data(ttl=300)
-def load_batch_data():
-    """Load batch data from sheet index 4"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
-
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 4 (fifth sheet)
-        worksheet = sh.get_worksheet(4)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 2:
-            st.warning("Not enough data in sheet index 4")
-            return pd.DataFrame()
-
-        # Create DataFrame with headers from first row
-        df = pd.DataFrame(data[1:], columns=data[0])
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        # Add normalized column for case-insensitive matching
-        if len(df.columns) > 0:
-            df['_normalized_name'] = df.iloc[:, 0].str.strip().str.lower()
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading batch data: {str(e)}")
-        return pd.DataFrame()
-
-# --- LOAD INGREDIENTS DATA ---
-@st.cache_data(ttl=300)
-def load_ingredients_data():
-    """Load ingredients data from sheet index 4 (5th sheet)"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
-
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 4 (fifth sheet)
-        worksheet = sh.get_worksheet(4)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 2:
-            st.warning("Not enough data in sheet index 4 for ingredients")
-            return pd.DataFrame()
-
-        # Create DataFrame with headers from first row
-        df = pd.DataFrame(data[1:], columns=data[0])
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        # Add normalized column for case-insensitive matching
-        if len(df.columns) > 0:
-            df['_normalized_subrecipe'] = df.iloc[:, 0].str.strip().str.lower()
-            df['_normalized_ingredient'] = df.iloc[:, 1].str.strip().str.lower()
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading ingredients data: {str(e)}")
-        return pd.DataFrame()
-
-# --- LOAD WPS DATA ---
-@st.cache_data(ttl=300)
-def load_wps_data():
-    """Load WPS data from sheet index 5 (6th sheet)"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
-
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 5 (6th sheet)
-        worksheet = sh.get_worksheet(5)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 11:
-            st.warning("Not enough data in sheet index 5")
-            return pd.DataFrame()
-
-        # Header starts at row 10 (index 9), data starts at row 11 (index 10)
-        headers = data[9]
-        data_rows = data[10:]
-        
-        # Handle duplicate column names by adding suffixes
-        seen = {}
-        unique_headers = []
-        for header in headers:
-            if header == '' or header in seen:
-                # For empty or duplicate headers, create unique names
-                count = seen.get(header, 0)
-                seen[header] = count + 1
-                if header == '':
-                    unique_headers.append(f'Column_{len(unique_headers)}')
-                else:
-                    unique_headers.append(f'{header}_{count}')
-            else:
-                unique_headers.append(header)
-                seen[header] = 1
-        
-        # Create DataFrame with unique headers
-        df = pd.DataFrame(data_rows, columns=unique_headers)
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading WPS data: {str(e)}")
-        return pd.DataFrame()
-
-# --- LOAD BEGINNING INVENTORY DATA ---
-@st.cache_data(ttl=300)
-def load_beginning_inventory_data():
-    """Load beginning inventory data from sheet index 6 (7th sheet)"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
-
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 6 (7th sheet)
-        worksheet = sh.get_worksheet(6)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 3:
-            st.warning("Not enough data in sheet index 6 for beginning inventory")
-            return pd.DataFrame()
-
-        # Header is at row 2 (index 1), data starts at row 3 (index 2)
-        headers = data[1]
-        data_rows = data[2:182]  # Rows 3 to 182 (indices 2 to 181)
-        
-        # Create DataFrame
-        df = pd.DataFrame(data_rows, columns=headers)
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        # Add normalized column for ingredient names (Column C, index 2) for matching with recipes
-        if len(df.columns) > 2:
-            df['_normalized_raw_material'] = df.iloc[:, 2].astype(str).str.strip().str.lower()
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error loading beginning inventory data: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(ttl=300)
-def get_beginning_inventory_row1():
-    """Get Row 1 data from beginning inventory sheet (the actual first row, not headers)"""
-    credentials = load_credentials()
-    if not credentials:
-        return []
-
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
-
-        # Get sheet index 6 (7th sheet)
-        worksheet = sh.get_worksheet(6)
-        data = worksheet.get_all_values()
-        
-        if len(data) > 0:
-            return data[0]  # Return Row 1 (index 0)
-        return []
-
-    except Exception as e:
-        st.error(f"Error loading Row 1: {str(e)}")
-        return []
+# One instance of each srcore object per server process
+@st.cache_resource
+def get_data_source():
+    """Shared data source behind the quota gateway: the local fixture named by SRGUIDE_FIXTURE, otherwise Google Sheets"""
+    source = source_from_env()
+    if source is None:
+        credentials = load_credentials()
+        if not credentials:
+            return None
+        source = SheetsClient(credentials, SPREADSHEET_ID)
+    return SheetsGateway(source)
 
-def load_pack_size_data():
-    """Load pack size data from sheet index 9 (10th sheet)"""
-    credentials = load_credentials()
-    if not credentials:
-        return pd.DataFrame()
+@st.cache_resource
+def get_raw_sheet_cache():
+    """Shared raw cache for every range the app reads"""
+    return RawSheetCache(SPREADSHEET_ID)
 
-    try:
-        gc = gspread.authorize(credentials)
-        spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-        sh = gc.open_by_key(spreadsheet_id)
+@st.cache_resource
+def get_refresh_controller():
+    """Shared refresh controller for the raw grid cache"""
+    return RefreshController(get_data_source(), get_raw_sheet_cache())
 
-        # Get sheet index 9 (10th sheet)
-        worksheet = sh.get_worksheet(7)
-        data = worksheet.get_all_values()
-        
-        if len(data) < 5:
-            st.warning("Not enough data in sheet index 9 for pack size")
-            return pd.DataFrame()
+@st.cache_resource
+def get_snapshot_store():
+    """Shared on-disk snapshot store"""
+    return SnapshotStore(SNAPSHOT_DIR)
 
-        # Header is at row 5 (index 4), data starts at row 6 (index 5)
-        headers = data[4]
-        data_rows = data[5:]
-        
-        # Create DataFrame
-        df = pd.DataFrame(data_rows, columns=headers)
-        
-        # Clean the data
-        df = df.replace('', pd.NA)
-        
-        # Add normalized column for raw material names (Column A, index 0)
-        if len(df.columns) > 0:
-            df['_normalized_raw_material'] = df.iloc[:, 0].astype(str).str.strip().str.lower()
-        
-        return df
+@st.cache_resource
+def get_snapshot_refresher():
+    """Shared background refresher, started once per process. It follows the sync process's snapshots;
+    embedded, the server process holding the lease downloads and the others map its snapshot"""
+    if SYNC_MODE != 'embedded':
+        return SnapshotRefresher(None, get_snapshot_store()).start()
+    return SnapshotRefresher(
+        get_refresh_controller(), get_snapshot_store(), lease=SnapshotLease(SNAPSHOT_DIR)
+    ).start()
 
-    except Exception as e:
-        st.error(f"Error loading pack size data: {str(e)}")
-        return pd.DataFrame()
+@st.cache_resource
+def get_perf_log():
+    """JSON perf log named by SRGUIDE_PERF_LOG: a file path, or '-' for stderr"""
+    return configure_perf_log(os.environ.get('SRGUIDE_PERF_LOG'))
+
+# --- PERFORMANCE PANEL ---
+# Opt-in with ?perf=1: timing spans of the run are shown under the page
+show_perf = st.query_params.get('perf') == '1'
+
+def show_perf_panel(recorder):
+    """Table of the run's spans: wall time, rows processed and cache hit/miss"""
+    if not show_perf:
+        return
+    spans = pd.DataFrame(recorder.as_records(), columns=['stage', 'ms', 'rows', 'cache', 'depth', 'error'])
+    # Indent nested stages under the one that triggered them
+    spans['stage'] = ['\u00a0' * 4 * depth + stage for stage, depth in zip(spans['stage'], spans['depth'])]
+    with st.expander(f"Performance: {recorder.label} ({recorder.elapsed_seconds * 1000:,.1f} ms)", expanded=True):
+        st.dataframe(spans.drop(columns='depth'), use_container_width=True, hide_index=True)
+        # Quota of whichever process reads Google Sheets, as it last published it
+        gateway = get_data_source() if SYNC_MODE == 'embedded' else None
+        quota = gateway.stats() if gateway is not None else (get_snapshot_store().load_status() or {}).get('quota')
+        if quota:
+            st.caption(
+                f"Sheets API: {quota['reads_last_minute']}/{quota['read_budget']} reads in the last minute "
+                f"({quota['headroom']} left), {quota['retries']} retries, {quota['quota_errors']} quota errors, "
+                f"{quota['coalesced']} coalesced, calls {quota['calls']}"
+            )
+        current = snapshot_refresher.current()
+        if current is not None:
+            # Resident size of each dataset held by the shared snapshot, largest first
+            memory = pd.DataFrame(list(current.memory_report().items()), columns=['dataset', 'bytes'])
+            memory['KB'] = (memory.pop('bytes') / 1024).round(1)
+            memory = memory.sort_values('KB', ascending=False)
+            st.caption(f"Snapshot memory: {memory['KB'].sum():,.1f} KB")
+            st.dataframe(memory, use_container_width=True, hide_index=True)
+
+def instrumented(label):
+    """Record a page section as a span; when it reruns on its own, log it and show its panel"""
+    def decorate(func):
+        @wraps(func)
+        def run():
+            if current_recorder() is not None:
+                with span(label):
+                    func()
+                return
+            recorder = start_recording(label)
+            try:
+                func()
+            finally:
+                finish_recording(recorder)
+            show_perf_panel(recorder)
+        return run
+    return decorate
+
+def format_age(seconds):
+    """Short human-readable age, e.g. '45s', '12 min', '3 h'"""
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h"
+    return f"{int(seconds // 86400)} d"
+
+def loading_message():
+    if snapshot_refresher.reader:
+        return "Waiting for the sync service to publish data..."
+    return "Loading data from Google Sheets..."
+
+def load_page_datasets(page, snapshot):
+    """Materialize only the datasets the page declares in PAGE_DATASETS"""
+    names = PAGE_DATASETS[page]
+    snapshot_refresher.require(names)
+    sources = [name for name in expand_dependencies(names) if name in DATASETS]
+    if snapshot is not None and snapshot.source == 'disk' and not all(snapshot.has(name) for name in sources):
+        with st.spinner(loading_message()):
+            snapshot = snapshot_refresher.wait_for_snapshot(timeout=5 if snapshot_refresher.reader else 120)
+
+    datasets = {}
+    for name in names:
+        value = snapshot.get(name) if snapshot is not None else None
+        if value is None and name in DATASETS:
+            value = DATASETS[name].empty()
+        elif value is None and snapshot is None:
+            value = {}
+        # A derived dataset built as None stays None: the WPS plan and plan cube when columns P-V are empty
+        datasets[name] = value
+    return datasets
 
 # Load data
-subrecipe_df = load_subrecipe_data()
-batch_df = load_batch_data()
-ingredients_df = load_ingredients_data()
-wps_df = load_wps_data()
-beginning_inventory_df = load_beginning_inventory_data()
-beginning_inventory_row1 = get_beginning_inventory_row1()
-pack_size_df = load_pack_size_data()
+get_perf_log()
+page_recorder = start_recording(f"page:{st.session_state.page}")
+snapshot_refresher = get_snapshot_refresher()
+snapshot = snapshot_refresher.current()
+if snapshot is None:
+    # A reader only waits for the next check of the snapshot directory, never for a download
+    with st.spinner(loading_message()):
+        snapshot = snapshot_refresher.wait_for_snapshot(timeout=5 if snapshot_refresher.reader else 120)
+
+if snapshot is None and snapshot_refresher.reader:
+    # Nothing published yet: the pages have nothing to show, and no connection of their own to blame
+    if snapshot_refresher.last_error is not None:
+        st.error(f"The sync service has no data to publish yet ({snapshot_refresher.last_error}). Please reload in a minute.")
+    else:
+        st.info("Waiting for the sync service (python -m srcore.sync) to publish the first snapshot. Please reload in a moment.")
+    finish_recording(page_recorder)
+    st.stop()
+
+if isinstance(snapshot_refresher.last_error, QuotaExceededError):
+    # Throttled by Google: the refresher keeps backing off, pages stay on the data they have
+    if snapshot is not None:
+        st.warning(f"Google Sheets read quota reached; retrying in the background. Showing data from {format_age(snapshot.age_seconds)} ago.")
+    else:
+        st.error("Google Sheets read quota reached; retrying in the background. Please reload in a minute.")
+elif snapshot_refresher.last_error is not None:
+    if snapshot_refresher.reader:
+        st.warning(f"No fresh data from the sync service ({snapshot_refresher.last_error}). Showing saved data from {format_age(snapshot.age_seconds)} ago.")
+    elif snapshot is not None:
+        st.warning(f"Google Sheets is unavailable ({snapshot_refresher.last_error}). Showing saved data from {format_age(snapshot.age_seconds)} ago.")
+    else:
+        st.error(f"Error loading Google Sheets data: {str(snapshot_refresher.last_error)}")
+elif snapshot is not None and snapshot.source == 'disk' and not snapshot_refresher.reader:
+    st.caption(f"Showing saved data from {format_age(snapshot.age_seconds)} ago while fresh data loads from Google Sheets.")
+
+with span('load:page_datasets'):
+    page_data = load_page_datasets(st.session_state.page, snapshot)
 
 # Page routing
 if st.session_state.page == "subrecipe":
     # SUBRECIPE GUIDE PAGE
+    subrecipe_df = page_data['subrecipe']
+    ingredients_df = page_data['ingredients']
+    subrecipes = page_data['subrecipes']
+    pack_sizes = page_data['pack_sizes']
+
     if subrecipe_df.empty:
         st.error("Unable to load subrecipe data. Please check your Google Sheets connection.")
         st.stop()
 
-    # Get subrecipe options from column A and deduplicate case-insensitively
-    subrecipe_options = []
-    if len(subrecipe_df.columns) > 0:
-        # Get the first column (A) and remove empty values
-        col_a_data = subrecipe_df.iloc[:, 0].dropna()
-        
-        # Create a dict to track unique normalized names and keep first occurrence
-        seen_normalized = {}
-        for item in col_a_data:
-            item_str = str(item).strip()
-            if item_str:
-                normalized = item_str.lower()
-                if normalized not in seen_normalized:
-                    seen_normalized[normalized] = item_str
-        
-        subrecipe_options = list(seen_normalized.values())
+    # Subrecipe options from column A, deduplicated case-insensitively
+    subrecipe_options = page_data['subrecipe_options']
 
     if not subrecipe_options:
         st.error("No subrecipe options found in column A of sheet index 1")
         st.stop()
 
-    # Controls
-    col1, col2 = st.columns([2, 1])
-
-    with col1:
-        st.write("**Select Sub-Recipe:**")
-        selected_recipe = st.selectbox(
-            "Choose a subrecipe",
-            options=subrecipe_options,
-            key="recipe_selector",
-            label_visibility="collapsed"
-        )
-
-    with col2:
-        st.write("**Batch Input:**")
-        batch_input = st.number_input(
-            "Batch quantity",
-            min_value=1,
-            max_value=1000,
-            value=1,
-            step=1,
-            key="batch_input",
-            label_visibility="collapsed"
-        )
-
-    # Calculate values based on selection
-    if selected_recipe:
-        # Normalize the selected recipe for matching
-        selected_normalized = selected_recipe.strip().lower()
-        
-        # Find the row for selected recipe (case-insensitive)
-        recipe_row = subrecipe_df[subrecipe_df['_normalized_name'] == selected_normalized]
-        
-        if not recipe_row.empty:
-            recipe_data = recipe_row.iloc[0]
-            
-            # Extract values from specific columns
-            try:
-                # Pack Size (col G = index 6)
-                pack_size = 0
-                if len(recipe_data) > 6 and pd.notna(recipe_data.iloc[6]):
-                    pack_size = float(recipe_data.iloc[6])
-                
-                # Shelf Life (col H = index 7)
-                shelf_life = 0
-                if len(recipe_data) > 7 and pd.notna(recipe_data.iloc[7]):
-                    shelf_life = int(float(recipe_data.iloc[7]))
-                
-                # Storage Condition (col I = index 8)
-                storage_condition = "Not specified"
-                if len(recipe_data) > 8 and pd.notna(recipe_data.iloc[8]):
-                    storage_condition = str(recipe_data.iloc[8])
-                
-            except (ValueError, IndexError) as e:
-                st.warning(f"Error parsing recipe data: {e}")
-                pack_size = 0
-                shelf_life = 0
-                storage_condition = "Not specified"
+    # Controls and results rerun on their own when the recipe or batch quantity changes
+    @fragment
+    @instrumented('subrecipe_calculator')
+    def subrecipe_calculator():
+        # Controls
+        col1, col2 = st.columns([2, 1])
+
+        with col1:
+            st.write("**Select Sub-Recipe:**")
+            selected_recipe = st.selectbox(
+                "Choose a subrecipe",
+                options=subrecipe_options,
+                key="recipe_selector",
+                label_visibility="collapsed"
+            )
+
+        with col2:
+            st.write("**Batch Input:**")
+            batch_input = st.number_input(
+                "Batch quantity",
+                min_value=1,
+                max_value=1000,
+                value=1,
+                step=1,
+                key="batch_input",
+                label_visibility="collapsed"
+            )
+
+        # Calculate values based on selection
+        if selected_recipe:
+            # Find the selected recipe (case-insensitive)
+            subrecipe = subrecipes.get(selected_recipe.strip().lower())
+        
+            if subrecipe is not None:
+                if subrecipe.parse_error:
+                    st.warning(f"Error parsing recipe data: {subrecipe.parse_error}")
             
-            # Get Batch Output from sheet index 4, column C (case-insensitive match)
-            batch_output = 0
-            if not batch_df.empty:
-                # Find matching recipe in batch data using normalized names
-                batch_row = batch_df[batch_df['_normalized_name'] == selected_normalized]
-                if not batch_row.empty and len(batch_row.iloc[0]) > 2:
-                    try:
-                        batch_output = float(batch_row.iloc[0].iloc[2])  # Column C = index 2
-                    except (ValueError, IndexError):
-                        batch_output = 0
+                pack_size = subrecipe.pack_size
+                shelf_life = subrecipe.shelf_life
+                storage_condition = subrecipe.storage_condition
+                batch_output = subrecipe.batch_output
             
-            # Calculate derived values
-            total_expected_output = batch_output * batch_input
-            expected_packs = 0
-            if pack_size > 0:
-                expected_packs = int(total_expected_output / pack_size)
+                # Calculate derived values
+                total_expected_output = subrecipe.expected_output(batch_input)
+                expected_packs = subrecipe.expected_packs(batch_input)
             
-            # Display results
-            col1, col2, col3 = st.columns(3)
+                # Display results
+                col1, col2, col3 = st.columns(3)
             
-            with col1:
-                st.metric("Batch Output (KG)", f"{batch_output:.2f}")
-                st.metric("Total Expected Output (KG)", f"{total_expected_output:.2f}")
+                with col1:
+                    st.metric("Batch Output (KG)", f"{batch_output:.2f}")
+                    st.metric("Total Expected Output (KG)", f"{total_expected_output:.2f}")
             
-            with col2:
-                st.metric("Pack Size (KG)", f"{pack_size:.2f}")
-                st.metric("Expected Total No. of Packs", expected_packs)
+                with col2:
+                    st.metric("Pack Size (KG)", f"{pack_size:.2f}")
+                    st.metric("Expected Total No. of Packs", expected_packs)
             
-            with col3:
-                st.metric("Shelf Life (days)", shelf_life)
-                st.metric("Storage Condition", storage_condition)
+                with col3:
+                    st.metric("Shelf Life (days)", shelf_life)
+                    st.metric("Storage Condition", storage_condition)
             
-            # Display Ingredients Table
-            if not ingredients_df.empty:
-                # Filter ingredients for selected recipe (case-insensitive)
-                recipe_ingredients = ingredients_df[ingredients_df['_normalized_subrecipe'] == selected_normalized].copy()
-                
-                if not recipe_ingredients.empty:
-                    # Remove duplicates based on subrecipe + ingredient combination
-                    recipe_ingredients = recipe_ingredients.drop_duplicates(
-                        subset=['_normalized_subrecipe', '_normalized_ingredient'],
-                        keep='first'
-                    )
-                    
-                    # Prepare display data
-                    ingredients_display = []
-                    for idx, row in recipe_ingredients.iterrows():
-                        ingredient_name = row.iloc[1] if pd.notna(row.iloc[1]) else "N/A"  # Column B
-                        qty_conversion = 0
-                        
-                        # Get quantity conversion from Column D (index 3)
-                        if len(row) > 3 and pd.notna(row.iloc[3]):
-                            try:
-                                qty_conversion = float(row.iloc[3])
-                            except (ValueError, TypeError):
-                                qty_conversion = 0
-                        
-                        # Calculate total quantity (multiply by batch input)
-                        total_qty = qty_conversion * batch_input
-                        
-                        # Find pack size for this ingredient
-                        pack_size_value = ""
-                        if not pack_size_df.empty:
-                            # Normalize the ingredient name for matching
-                            name_normalized = ingredient_name.strip().lower()
-                            
-                            # Find matching row in pack size data
-                            pack_row = pack_size_df[
-                                pack_size_df['_normalized_raw_material'] == name_normalized
-                            ]
-                            
-                            if not pack_row.empty:
-                                # Get value from column B (index 1)
-                                if len(pack_row.iloc[0]) > 1:
-                                    pack_value = pack_row.iloc[0].iloc[1]
-                                    if pd.notna(pack_value) and pack_value != '':
-                                        pack_size_value = str(pack_value)
-                        
-                        # Only add if qty_conversion is not 0
-                        if qty_conversion != 0:
-                            ingredients_display.append({
-                                "Ingredient": ingredient_name,
-                                "Pack Size": pack_size_value,
-                                "Qty per Batch (KG)": f"{qty_conversion:,.2f}",
-                                "Total Qty (KG)": f"{total_qty:,.2f}",
-                                "UOM": "KG"
-                            })
+                # Display Ingredients Table
+                if not ingredients_df.empty:
+                    if subrecipe.lines:
+                        # Prepare display data
+                        ingredients_display = []
+                        total_weight = 0
+                        with span('aggregate:ingredients', rows=len(subrecipe.lines)):
+                            for line in subrecipe.lines:
+                                # Only add if qty_conversion is not 0
+                                if line.qty_per_batch != 0:
+                                    # Calculate total quantity (multiply by batch input)
+                                    total_qty = line.qty_per_batch * batch_input
+                                    total_weight += total_qty
+                                    ingredients_display.append({
+                                        "Ingredient": line.ingredient,
+                                        "Pack Size": pack_sizes.get(line.key, ""),
+                                        "Qty per Batch (KG)": f"{line.qty_per_batch:,.2f}",
+                                        "Total Qty (KG)": f"{total_qty:,.2f}",
+                                        "UOM": "KG"
+                                    })
                     
-                    if ingredients_display:
-                        # Convert to DataFrame
-                        df_display = pd.DataFrame(ingredients_display)
+                        if ingredients_display:
+                            # Convert to DataFrame
+                            df_display = pd.DataFrame(ingredients_display)
                         
-                        # Convert DataFrame to HTML
-                        html_table = df_display.to_html(
-                            escape=False,
-                            index=False,
-                            classes='ingredients-table',
-                            table_id='ingredients-table'
-                        )
-                        
-                        # Wrap table in container
-                        table_html = f"""
-                        <div class="ingredients-table-container">
-                            {html_table}
-                        </div>
-                        """
+                            # Convert DataFrame to HTML
+                            with span('render:ingredients_table', rows=len(df_display)):
+                                html_table = df_display.to_html(
+                                    escape=False,
+                                    index=False,
+                                    classes='ingredients-table',
+                                    table_id='ingredients-table'
+                                )
                         
-                        st.markdown(table_html, unsafe_allow_html=True)
+                            # Wrap table in container
+                            table_html = f"""
+                            <div class="ingredients-table-container">
+                                {html_table}
+                            </div>
+                            """
                         
-                        # Calculate total weight and display in two columns
-                        total_weight = sum([float(item["Total Qty (KG)"]) for item in ingredients_display])
+                            st.markdown(table_html, unsafe_allow_html=True)
                         
-                        col_left, col_right = st.columns([3, 1])
+                            # Display total weight in two columns
+                            col_left, col_right = st.columns([3, 1])
                         
-                        with col_right:
-                            st.markdown(f"""
-                                <div class="total-weight-box">
-                                    <span class="weight-label">Total Volume:</span> {total_weight:,.2f} KG
-                                </div>
-                            """, unsafe_allow_html=True)
+                            with col_right:
+                                st.markdown(f"""
+                                    <div class="total-weight-box">
+                                        <span class="weight-label">Total Volume:</span> {total_weight:,.2f} KG
+                                    </div>
+                                """, unsafe_allow_html=True)
+                        else:
+                            st.warning("No valid ingredient data found for this recipe")
                     else:
-                        st.warning("No valid ingredient data found for this recipe")
+                        st.warning(f"No ingredients found for '{selected_recipe}'")
                 else:
-                    st.warning(f"No ingredients found for '{selected_recipe}'")
-            else:
-                st.error("Unable to load ingredients data")
+                    st.error("Unable to load ingredients data")
         
+            else:
+                st.error(f"Recipe '{selected_recipe}' not found in the data")
+
         else:
-            st.error(f"Recipe '{selected_recipe}' not found in the data")
+            st.info("Please select a subrecipe to see the analytics")
 
-    else:
-        st.info("Please select a subrecipe to see the analytics")
+    subrecipe_calculator()
 
 elif st.session_state.page == "Weekly Inventory":
     # WPS PAGE
-    if wps_df.empty:
-        st.error("Unable to load WPS data. Please check your Google Sheets connection.")
-    else:
-        if len(wps_df.columns) > 21:
-            # Get the actual headers
-            credentials = load_credentials()
-            if credentials:
-                try:
-                    gc = gspread.authorize(credentials)
-                    spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-                    sh = gc.open_by_key(spreadsheet_id)
-                    worksheet = sh.get_worksheet(5)
-                    header_row = worksheet.get_all_values()[9]
-                    batch_headers = [header_row[i] if i < len(header_row) else f'Batch {i-14}' for i in range(15, 22)]
-                except:
-                    batch_headers = [f'Batch {i}' for i in range(1, 8)]
-            else:
-                batch_headers = [f'Batch {i}' for i in range(1, 8)]
-            
-            # Select columns A and P-V
-            display_df = wps_df.iloc[:, [0] + list(range(15, 22))].copy()
-            column_names = ['Subrecipe'] + batch_headers
-            display_df.columns = column_names
-            
-            # Remove empty rows
-            display_df = display_df[display_df.iloc[:, 0].notna()]
-            display_df = display_df[display_df.iloc[:, 0] != '']
-            
-            # Normalize and filter
-            display_df['_normalized'] = display_df['Subrecipe'].str.strip().str.lower()
-            
-            exclude_terms = [
-                'hot kitchen', 'hot kitchen sauce', 'hot kitchen savory', 
-                'cold sauce', 'fabrication poultry', 'fabrication meats', 'pastry'
-            ]
-            
-            for term in exclude_terms:
-                display_df = display_df[display_df['_normalized'] != term]
-            
-            # Filter invalid batches
-            batch_cols = display_df.columns[1:-1]
-            
-            def has_valid_batch(row):
-                for col in batch_cols:
-                    val = str(row[col]).strip()
-                    if val and val != '':
-                        invalid_values = ['0', '0.0', '.0', '0.00', '.00', '-.0', '-0', '-0.0', '- .0']
-                        if val in invalid_values:
-                            continue
-                        try:
-                            num_val = float(val.replace(' ', ''))
-                            if num_val > 0:
-                                return True
-                        except (ValueError, TypeError):
-                            return True
-                return False
-            
-            display_df = display_df[display_df.apply(has_valid_batch, axis=1)]
-            
-            # Calculate total batches per subrecipe
-            display_df['Total_Batches'] = 0
-            for col in batch_cols:
-                display_df['Total_Batches'] += pd.to_numeric(display_df[col], errors='coerce').fillna(0)
-            
-            display_df = display_df.drop(columns=['_normalized'])
+    wps_df = page_data['wps']
+    wps_plan = page_data['wps_plan']
+    plan_cube = page_data['plan_cube']
+
+    # Filter and tables rerun on their own when the filter changes
+    @fragment
+    @instrumented('weekly_inventory')
+    def weekly_inventory():
+        if wps_df.empty:
+            st.error("Unable to load WPS data. Please check your Google Sheets connection.")
+        else:
+            if wps_plan is not None:
+                # WPS plan filtered once per snapshot, shared with the other inventory page
+                display_df = wps_plan.table
             
-            if not display_df.empty:
-                # Get all unique types of raw materials for filter
-                all_rm_types = set()
-                if not ingredients_df.empty:
-                    for name in display_df['Subrecipe']:
-                        subrecipe_normalized = name.strip().lower()
-                        recipe_ingredients = ingredients_df[
-                            ingredients_df['_normalized_subrecipe'] == subrecipe_normalized
-                        ].copy()
-                        
-                        if not recipe_ingredients.empty:
-                            for _, ing_row in recipe_ingredients.iterrows():
-                                # Get type from Column H (index 7) by matching Column G (index 6)
-                                if len(ing_row) > 7:
-                                    rm_type = ing_row.iloc[7] if pd.notna(ing_row.iloc[7]) else "N/A"
-                                    if rm_type != "N/A":
-                                        all_rm_types.add(rm_type)
-                
-                # Add "Frozen Meat" to filter options and sort
-                all_rm_types.add("FROZEN MEAT")
-                rm_type_options = ["All"] + sorted(list(all_rm_types))
-                
-                # Add filter dropdown
-                st.markdown("### Filter by Type of Raw Material")
-                selected_rm_type = st.selectbox("Select Type", options=rm_type_options, key="wps_rm_type_filter")
-                
-                st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
+                if not display_df.empty:
+                    # Add filter dropdown
+                    st.markdown("### Filter by Type of Raw Material")
+                    selected_rm_type = st.selectbox("Select Type", options=plan_cube.rm_type_options, key="wps_rm_type_filter")
                 
-                # Aggregate ingredients maintaining subrecipe order FIRST
-                all_ingredients = {}
-                ingredient_order = []  # Track order of first appearance
+                    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
                 
-                for idx, row in display_df.iterrows():
-                    subrecipe_name = row['Subrecipe']
-                    total_batches = row['Total_Batches']
-                    
-                    # Find ingredients for this subrecipe
-                    subrecipe_normalized = subrecipe_name.strip().lower()
-                    recipe_ingredients = ingredients_df[
-                        ingredients_df['_normalized_subrecipe'] == subrecipe_normalized
-                    ].copy()
-                    
-                    if not recipe_ingredients.empty:
-                        # Remove duplicates
-                        recipe_ingredients = recipe_ingredients.drop_duplicates(
-                            subset=['_normalized_subrecipe', '_normalized_ingredient'],
-                            keep='first'
-                        )
-                        
-                        for _, ing_row in recipe_ingredients.iterrows():
-                            ingredient_name = ing_row.iloc[1] if pd.notna(ing_row.iloc[1]) else "N/A"
-                            qty_conversion = 0
-                            
-                            if len(ing_row) > 3 and pd.notna(ing_row.iloc[3]):
-                                try:
-                                    qty_conversion = float(ing_row.iloc[3])
-                                except (ValueError, TypeError):
-                                    qty_conversion = 0
-                            
-                            if qty_conversion > 0:
-                                total_qty = qty_conversion * total_batches
-                                
-                                if ingredient_name not in all_ingredients:
-                                    ingredient_order.append(ingredient_name)
-                                    all_ingredients[ingredient_name] = total_qty
-                                else:
-                                    all_ingredients[ingredient_name] += total_qty
-                
-                # Calculate totals for display
-                total_materials = sum(all_ingredients.values()) if all_ingredients else 0
-                
-                # Calculate total price
-                total_price_sum = 0
-                if all_ingredients:
-                    for name in ingredient_order:
-                        total_qty = all_ingredients[name]
-                        
-                        # Find price and qty conversion
-                        price = 0
-                        qty_conv = 1
-                        
-                        if not ingredients_df.empty:
-                            name_normalized = name.strip().lower()
-                            price_row = ingredients_df[
-                                ingredients_df['_normalized_ingredient'] == name_normalized
-                            ]
-                            
-                            if not price_row.empty:
-                                if len(price_row.iloc[0]) > 4:
-                                    try:
-                                        price_value = price_row.iloc[0].iloc[4]
-                                        if pd.notna(price_value) and price_value != '':
-                                            price_str = str(price_value).replace('₱', '').replace(',', '').strip()
-                                            price = float(price_str)
-                                    except (ValueError, TypeError, IndexError):
-                                        price = 0
-                                
-                                if len(price_row.iloc[0]) > 3:
-                                    try:
-                                        qty_conv_value = price_row.iloc[0].iloc[3]
-                                        if pd.notna(qty_conv_value) and qty_conv_value != '':
-                                            qty_conv = float(qty_conv_value)
-                                            if qty_conv == 0:
-                                                qty_conv = 1
-                                    except (ValueError, TypeError, IndexError):
-                                        qty_conv = 1
-                        
-                        total_price = (total_qty / qty_conv) * price
-                        total_price_sum += total_price
+                    # Weekly raw materials, a slice of the plan cube
+                    week_materials = plan_cube.materials_for(WEEK_COLUMN)
                 
-                # Create two columns layout with adjusted widths
-                col_left, col_right = st.columns([2, 3])
+                    # Create two columns layout with adjusted widths
+                    col_left, col_right = st.columns([2, 3])
                 
-                with col_left:
-                    st.markdown("### SKU Weekly Batches")
-                    
-                    # Placeholder for total - will be calculated after filtering
-                    total_materials_placeholder = st.empty()
+                    with col_left:
+                        st.markdown("### SKU Weekly Batches")
                     
-                    # Display batch table (without Total_Batches column)
-                    batch_display = display_df.drop(columns=['Total_Batches'])
+                        # Placeholder for total - will be calculated after filtering
+                        total_materials_placeholder = st.empty()
                     
-                    html_table = batch_display.to_html(
-                        escape=False,
-                        index=False,
-                        classes='wps-table',
-                        table_id='wps-table'
-                    )
+                        # Display batch table
+                        with span('render:batch_table', rows=len(display_df)):
+                            html_table = display_df.to_html(
+                                escape=False,
+                                index=False,
+                                classes='wps-table',
+                                table_id='wps-table'
+                            )
                     
-                    table_html = f"""
-                    <div class="wps-table-container">
-                        {html_table}
-                    </div>
-                    """
+                        table_html = f"""
+                        <div class="wps-table-container">
+                            {html_table}
+                        </div>
+                        """
                     
-                    st.markdown(table_html, unsafe_allow_html=True)
-                    st.info(f"Total subrecipes: {len(display_df)}")
+                        st.markdown(table_html, unsafe_allow_html=True)
+                        st.info(f"Total subrecipes: {len(display_df)}")
                 
-                with col_right:
-                    st.markdown("### Raw Materials")
+                    with col_right:
+                        st.markdown("### Raw Materials")
                     
-                    # Placeholder for total price - will be calculated after filtering
-                    total_price_placeholder = st.empty()
+                        # Placeholder for total price - will be calculated after filtering
+                        total_price_placeholder = st.empty()
                     
-                    # Display aggregated ingredients in order of appearance with Beginning Inventory
-                    if all_ingredients:
-                        ingredients_list = []
-                        filtered_total_materials = 0
-                        filtered_total_price = 0
-                        
-                        for name in ingredient_order:
-                            total_qty = all_ingredients[name]
-                            
-                            # Get Type and Price from ingredients sheet (index 4)
-                            rm_type = "N/A"
-                            rm_price = 0
-                            qty_conv = 1
-                            
-                            if not ingredients_df.empty:
-                                name_normalized = name.strip().lower()
-                                
-                                # Match against Column G (index 6) for Type in Column H (index 7)
-                                type_row = ingredients_df[
-                                    ingredients_df.iloc[:, 6].astype(str).str.strip().str.lower() == name_normalized
-                                ]
-                                
-                                if not type_row.empty and len(type_row.iloc[0]) > 7:
-                                    rm_type_value = type_row.iloc[0].iloc[7]
-                                    if pd.notna(rm_type_value) and rm_type_value != '':
-                                        rm_type = str(rm_type_value)
-                                
-                                # Match against Column B (index 1) for Price in Column E (index 4) and Qty Conv in Column D (index 3)
-                                price_row = ingredients_df[
-                                    ingredients_df['_normalized_ingredient'] == name_normalized
-                                ]
-                                
-                                if not price_row.empty:
-                                    if len(price_row.iloc[0]) > 4:
-                                        try:
-                                            price_value = price_row.iloc[0].iloc[4]
-                                            if pd.notna(price_value) and price_value != '':
-                                                price_str = str(price_value).replace('₱', '').replace(',', '').strip()
-                                                rm_price = float(price_str)
-                                        except (ValueError, TypeError, IndexError):
-                                            rm_price = 0
-                                    
-                                    if len(price_row.iloc[0]) > 3:
-                                        try:
-                                            qty_conv_value = price_row.iloc[0].iloc[3]
-                                            if pd.notna(qty_conv_value) and qty_conv_value != '':
-                                                qty_conv = float(qty_conv_value)
-                                                if qty_conv == 0:
-                                                    qty_conv = 1
-                                        except (ValueError, TypeError, IndexError):
-                                            qty_conv = 1
-                            
+                        # Display aggregated ingredients in order of appearance with Beginning Inventory
+                        if not week_materials.empty:
                             # Apply filter
-                            if selected_rm_type != "All" and rm_type != selected_rm_type:
-                                continue
-                            
-                            # Add to filtered totals
-                            filtered_total_materials += total_qty
-                            item_price = (total_qty / qty_conv) * rm_price
-                            filtered_total_price += item_price
-                            
-                            # Find beginning inventory for this ingredient
-                            beginning_inv = 0
-                            if not beginning_inventory_df.empty:
-                                # Normalize the ingredient name for matching
-                                name_normalized = name.strip().lower()
-                                
-                                # Find matching row in beginning inventory
-                                inv_row = beginning_inventory_df[
-                                    beginning_inventory_df['_normalized_raw_material'] == name_normalized
-                                ]
-                                
-                                if not inv_row.empty:
-                                    # Get beginning inventory value from Column A (index 0)
-                                    try:
-                                        if len(inv_row.iloc[0]) > 0:
-                                            inv_value = inv_row.iloc[0].iloc[0]
-                                            if pd.notna(inv_value) and inv_value != '':
-                                                beginning_inv = float(inv_value)
-                                    except (ValueError, TypeError, IndexError):
-                                        beginning_inv = 0
-                            
-                            # Calculate difference
-                            difference = total_qty - beginning_inv
+                            filtered_materials = plan_cube.materials_for(WEEK_COLUMN, selected_rm_type)
+                        
+                            filtered_total_materials = filtered_materials['total_qty'].sum()
+                            filtered_total_price = filtered_materials['cost'].sum()
+                        
+                            ingredients_list = []
+                            with span('aggregate:raw_materials', rows=len(filtered_materials)):
+                                for item in filtered_materials.itertuples(index=False):
                             
-                            ingredients_list.append({
-                                "Raw Material": name,
-                                "Type": rm_type,
-                                "Price": f"₱{rm_price:,.2f}",
-                                "Total Qty (KG)": f"{total_qty:,.2f}",
-                                "Beginning (KG)": f"{beginning_inv:,.2f}",
-                                "Difference (KG)": f"<b>{difference:,.2f}</b>"
-                            })
+                                    ingredients_list.append({
+                                        "Raw Material": item.ingredient,
+                                        "Type": item.rm_type,
+                                        "Price": f"₱{item.price:,.2f}",
+                                        "Total Qty (KG)": f"{item.total_qty:,.2f}",
+                                        "Beginning (KG)": f"{item.beginning_inventory:,.2f}",
+                                        "Difference (KG)": f"<b>{item.difference:,.2f}</b>"
+                                    })
                         
-                        # Display totals in their respective positions
-                        with total_materials_placeholder:
-                            st.markdown(f"""
-                                <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
-                                    <span class="weight-label">Total Raw Materials:</span> {filtered_total_materials:,.2f} KG
-                                </div>
-                            """, unsafe_allow_html=True)
+                            # Display totals in their respective positions
+                            with total_materials_placeholder:
+                                st.markdown(f"""
+                                    <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
+                                        <span class="weight-label">Total Raw Materials:</span> {filtered_total_materials:,.2f} KG
+                                    </div>
+                                """, unsafe_allow_html=True)
                         
-                        with total_price_placeholder:
-                            st.markdown(f"""
-                                <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
-                                    <span class="weight-label">Total Price:</span> ₱{filtered_total_price:,.2f}
-                                </div>
-                            """, unsafe_allow_html=True)
+                            with total_price_placeholder:
+                                st.markdown(f"""
+                                    <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
+                                        <span class="weight-label">Total Price:</span> ₱{filtered_total_price:,.2f}
+                                    </div>
+                                """, unsafe_allow_html=True)
                         
-                        if ingredients_list:
-                            ingredients_display_df = pd.DataFrame(ingredients_list)
+                            if ingredients_list:
+                                ingredients_display_df = pd.DataFrame(ingredients_list)
                             
-                            html_table = ingredients_display_df.to_html(
-                                escape=False,
-                                index=False,
-                                classes='wps-table',
-                                table_id='ingredients-explosion'
-                            )
+                                with span('render:raw_materials_table', rows=len(ingredients_display_df)):
+                                    html_table = ingredients_display_df.to_html(
+                                        escape=False,
+                                        index=False,
+                                        classes='wps-table',
+                                        table_id='ingredients-explosion'
+                                    )
                             
-                            table_html = f"""
-                            <div class="wps-table-container">
-                                {html_table}
-                            </div>
-                            """
+                                table_html = f"""
+                                <div class="wps-table-container">
+                                    {html_table}
+                                </div>
+                                """
                             
-                            st.markdown(table_html, unsafe_allow_html=True)
+                                st.markdown(table_html, unsafe_allow_html=True)
+                            else:
+                                st.warning(f"No ingredients found for filter: {selected_rm_type}")
                         else:
-                            st.warning(f"No ingredients found for filter: {selected_rm_type}")
-                    else:
-                        st.warning("No ingredients data found for selected subrecipes")
+                            st.warning("No ingredients data found for selected subrecipes")
+                else:
+                    st.warning("No valid WPS data found after filtering")
             else:
-                st.warning("No valid WPS data found after filtering")
-        else:
-            st.error(f"Not enough columns in WPS data. Found {len(wps_df.columns)} columns, need at least 22.")
+                st.error("Not enough columns in WPS data. Columns P-V (the seven days) are empty.")
+
+    weekly_inventory()
 
 elif st.session_state.page == "daily_inventory":
     # DAILY INVENTORY PAGE
-    if wps_df.empty:
-        st.error("Unable to load WPS data. Please check your Google Sheets connection.")
-    else:
-        if len(wps_df.columns) > 21:
-            # Get the actual headers
-            credentials = load_credentials()
-            if credentials:
-                try:
-                    gc = gspread.authorize(credentials)
-                    spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-                    sh = gc.open_by_key(spreadsheet_id)
-                    worksheet = sh.get_worksheet(5)
-                    header_row = worksheet.get_all_values()[9]
-                    batch_headers = [header_row[i] if i < len(header_row) else f'Batch {i-14}' for i in range(15, 22)]
-                except:
-                    batch_headers = [f'Batch {i}' for i in range(1, 8)]
-            else:
-                batch_headers = [f'Batch {i}' for i in range(1, 8)]
-            
-            # Select columns A and P-V
-            display_df = wps_df.iloc[:, [0] + list(range(15, 22))].copy()
-            column_names = ['Subrecipe'] + batch_headers
-            display_df.columns = column_names
-            
-            # Remove empty rows
-            display_df = display_df[display_df.iloc[:, 0].notna()]
-            display_df = display_df[display_df.iloc[:, 0] != '']
-            
-            # Normalize and filter
-            display_df['_normalized'] = display_df['Subrecipe'].str.strip().str.lower()
-            
-            exclude_terms = [
-                'hot kitchen', 'hot kitchen sauce', 'hot kitchen savory', 
-                'cold sauce', 'fabrication poultry', 'fabrication meats', 'pastry'
-            ]
-            
-            for term in exclude_terms:
-                display_df = display_df[display_df['_normalized'] != term]
-            
-            # Filter invalid batches
-            batch_cols = display_df.columns[1:-1]
-            
-            def has_valid_batch(row):
-                for col in batch_cols:
-                    val = str(row[col]).strip()
-                    if val and val != '':
-                        invalid_values = ['0', '0.0', '.0', '0.00', '.00', '-.0', '-0', '-0.0', '- .0']
-                        if val in invalid_values:
-                            continue
-                        try:
-                            num_val = float(val.replace(' ', ''))
-                            if num_val > 0:
-                                return True
-                        except (ValueError, TypeError):
-                            return True
-                return False
-            
-            display_df = display_df[display_df.apply(has_valid_batch, axis=1)]
-            display_df = display_df.drop(columns=['_normalized'])
+    wps_df = page_data['wps']
+    beginning_inventory_df = page_data['beginning_inventory']
+    beginning_inventory_row1 = page_data['beginning_inventory_row1']
+    wps_plan = page_data['wps_plan']
+    plan_cube = page_data['plan_cube']
+
+    # Filters and tables rerun on their own when a filter changes
+    @fragment
+    @instrumented('daily_inventory')
+    def daily_inventory():
+        if wps_df.empty:
+            st.error("Unable to load WPS data. Please check your Google Sheets connection.")
+        else:
+            if wps_plan is not None:
+                # WPS plan filtered once per snapshot, shared with the other inventory page
+                display_df = wps_plan.table
+                batch_headers = wps_plan.day_headers
             
-            if not display_df.empty:
-                # Filters in same row
-                st.markdown("### Filters")
-                filter_col1, filter_col2 = st.columns(2)
+                if not display_df.empty:
+                    # Filters in same row
+                    st.markdown("### Filters")
+                    filter_col1, filter_col2 = st.columns(2)
                 
-                with filter_col1:
-                    day_options = batch_headers
-                    selected_day = st.selectbox("Choose a day", options=day_options, key="day_filter")
+                    with filter_col1:
+                        day_options = batch_headers
+                        selected_day = st.selectbox("Choose a day", options=day_options, key="day_filter")
                 
-                with filter_col2:
-                    # Get all unique types of raw materials for filter
-                    all_rm_types = set()
-                    if not ingredients_df.empty:
-                        for name in display_df['Subrecipe']:
-                            subrecipe_normalized = name.strip().lower()
-                            recipe_ingredients = ingredients_df[
-                                ingredients_df['_normalized_subrecipe'] == subrecipe_normalized
-                            ].copy()
-                            
-                            if not recipe_ingredients.empty:
-                                for _, ing_row in recipe_ingredients.iterrows():
-                                    # Get type from Column H (index 7) by matching Column G (index 6)
-                                    if len(ing_row) > 7:
-                                        rm_type = ing_row.iloc[7] if pd.notna(ing_row.iloc[7]) else "N/A"
-                                        if rm_type != "N/A":
-                                            all_rm_types.add(rm_type)
-                    
-                    # Add "Frozen Meat" to filter options and sort
-                    all_rm_types.add("FROZEN MEAT")
-                    rm_type_options = ["All"] + sorted(list(all_rm_types))
-                    selected_rm_type = st.selectbox("Select Type of RM", options=rm_type_options, key="daily_rm_type_filter")
+                    with filter_col2:
+                        selected_rm_type = st.selectbox("Select Type of RM", options=plan_cube.rm_type_options, key="daily_rm_type_filter")
                 
-                st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
+                    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
                 
-                # Get the column index for selected day
-                selected_day_index = batch_headers.index(selected_day) + 1  # +1 because column 0 is Subrecipe
+                    # Get the column index for selected day
+                    selected_day_index = batch_headers.index(selected_day) + 1  # +1 because column 0 is Subrecipe
                 
-                # Filter display_df to only show subrecipes with batches on selected day
-                filtered_display_df = display_df[
-                    pd.to_numeric(display_df.iloc[:, selected_day_index], errors='coerce').fillna(0) > 0
-                ].copy()
+                    # Filter display_df to only show subrecipes with batches on selected day
+                    filtered_display_df = wps_plan.day_plan(selected_day_index - 1)
                 
-                if not filtered_display_df.empty:
-                    # Aggregate ingredients for selected day only
-                    all_ingredients = {}
-                    ingredient_order = []
+                    if not filtered_display_df.empty:
+                        # Raw materials of the selected day, a slice of the plan cube
+                        day_materials = plan_cube.materials_for(selected_day_index - 1)
                     
-                    for idx, row in filtered_display_df.iterrows():
-                        subrecipe_name = row['Subrecipe']
-                        day_batches = pd.to_numeric(row.iloc[selected_day_index], errors='coerce')
-                        if pd.isna(day_batches):
-                            day_batches = 0
-                        
-                        # Find ingredients for this subrecipe
-                        subrecipe_normalized = subrecipe_name.strip().lower()
-                        recipe_ingredients = ingredients_df[
-                            ingredients_df['_normalized_subrecipe'] == subrecipe_normalized
-                        ].copy()
-                        
-                        if not recipe_ingredients.empty:
-                            recipe_ingredients = recipe_ingredients.drop_duplicates(
-                                subset=['_normalized_subrecipe', '_normalized_ingredient'],
-                                keep='first'
-                            )
-                            
-                            for _, ing_row in recipe_ingredients.iterrows():
-                                ingredient_name = ing_row.iloc[1] if pd.notna(ing_row.iloc[1]) else "N/A"
-                                qty_conversion = 0
-                                
-                                if len(ing_row) > 3 and pd.notna(ing_row.iloc[3]):
-                                    try:
-                                        qty_conversion = float(ing_row.iloc[3])
-                                    except (ValueError, TypeError):
-                                        qty_conversion = 0
-                                
-                                if qty_conversion > 0:
-                                    total_qty = qty_conversion * day_batches
-                                    
-                                    if ingredient_name not in all_ingredients:
-                                        ingredient_order.append(ingredient_name)
-                                        all_ingredients[ingredient_name] = total_qty
-                                    else:
-                                        all_ingredients[ingredient_name] += total_qty
-                    
-                    # Calculate totals
-                    total_materials = sum(all_ingredients.values()) if all_ingredients else 0
-                    
-                    # Calculate total price
-                    total_price_sum = 0
-                    if all_ingredients:
-                        for name in ingredient_order:
-                            total_qty = all_ingredients[name]
-                            
-                            # Find price and qty conversion
-                            price = 0
-                            qty_conv = 1
-                            
-                            if not ingredients_df.empty:
-                                name_normalized = name.strip().lower()
-                                price_row = ingredients_df[
-                                    ingredients_df['_normalized_ingredient'] == name_normalized
-                                ]
-                                
-                                if not price_row.empty:
-                                    if len(price_row.iloc[0]) > 4:
-                                        try:
-                                            price_value = price_row.iloc[0].iloc[4]
-                                            if pd.notna(price_value) and price_value != '':
-                                                price_str = str(price_value).replace('₱', '').replace(',', '').strip()
-                                                price = float(price_str)
-                                        except (ValueError, TypeError, IndexError):
-                                            price = 0
-                                    
-                                    if len(price_row.iloc[0]) > 3:
-                                        try:
-                                            qty_conv_value = price_row.iloc[0].iloc[3]
-                                            if pd.notna(qty_conv_value) and qty_conv_value != '':
-                                                qty_conv = float(qty_conv_value)
-                                                if qty_conv == 0:
-                                                    qty_conv = 1
-                                        except (ValueError, TypeError, IndexError):
-                                            qty_conv = 1
-                            
-                            total_price = (total_qty / qty_conv) * price
-                            total_price_sum += total_price
+                        # Create two columns layout
+                        col_left, col_right = st.columns([2, 3])
                     
-                    # Create two columns layout
-                    col_left, col_right = st.columns([2, 3])
-                    
-                    with col_left:
-                        st.markdown("### SKU Weekly Batches")
+                        with col_left:
+                            st.markdown("### SKU Weekly Batches")
                         
-                        # Placeholder for total - will be calculated after filtering
-                        total_inventory_placeholder = st.empty()
+                            # Placeholder for total - will be calculated after filtering
+                            total_inventory_placeholder = st.empty()
                         
-                        # Display batch table for selected day only
-                        batch_display = filtered_display_df[['Subrecipe', display_df.columns[selected_day_index]]]
-                        batch_display.columns = ['Subrecipe', selected_day]
+                            # Display batch table for selected day only
+                            batch_display = filtered_display_df[['Subrecipe', display_df.columns[selected_day_index]]]
+                            batch_display.columns = ['Subrecipe', selected_day]
                         
-                        html_table = batch_display.to_html(
-                            escape=False,
-                            index=False,
-                            classes='wps-table',
-                            table_id='wps-table-daily'
-                        )
+                            with span('render:batch_table', rows=len(batch_display)):
+                                html_table = batch_display.to_html(
+                                    escape=False,
+                                    index=False,
+                                    classes='wps-table',
+                                    table_id='wps-table-daily'
+                                )
                         
-                        table_html = f"""
-                        <div class="wps-table-container">
-                            {html_table}
-                        </div>
-                        """
+                            table_html = f"""
+                            <div class="wps-table-container">
+                                {html_table}
+                            </div>
+                            """
                         
-                        st.markdown(table_html, unsafe_allow_html=True)
-                        st.info(f"Total subrecipes: {len(filtered_display_df)}")
+                            st.markdown(table_html, unsafe_allow_html=True)
+                            st.info(f"Total subrecipes: {len(filtered_display_df)}")
                     
-                    with col_right:
-                        st.markdown("### Raw Materials")
+                        with col_right:
+                            st.markdown("### Raw Materials")
                         
-                        # Placeholder for total price - will be calculated after filtering
-                        total_price_placeholder = st.empty()
+                            # Placeholder for total price - will be calculated after filtering
+                            total_price_placeholder = st.empty()
                         
-                        # Display aggregated ingredients
-                        if all_ingredients:
-                            ingredients_list = []
-                            filtered_total_inventory = 0
-                            filtered_total_price = 0
+                            # Display aggregated ingredients
+                            if not day_materials.empty:
+                                ingredients_list = []
+                                filtered_total_inventory = 0
+                                filtered_total_price = 0
                             
-                            # Get date from Column B, Row 1 of beginning inventory sheet
-                            date_in_col_b = None
-                            matched = False
+                                # Get date from Column B, Row 1 of beginning inventory sheet
+                                date_in_col_b = None
+                                matched = False
                             
-                            if not beginning_inventory_df.empty and credentials:
-                                try:
-                                    gc = gspread.authorize(credentials)
-                                    spreadsheet_id = "1K7PTd9Y3X5j-5N_knPyZm8yxDEgxXFkVZOwnfQf98hQ"
-                                    sh = gc.open_by_key(spreadsheet_id)
-                                    inv_worksheet = sh.get_worksheet(6)
-                                    
-                                    # Get only Column B, Row 1
-                                    date_in_col_b = inv_worksheet.cell(1, 2).value  # Row 1, Column B (col index 2)
+                                if not beginning_inventory_df.empty and len(beginning_inventory_row1) > 1:
+                                    # Column B, Row 1
+                                    date_in_col_b = beginning_inventory_row1[1]
                                     if date_in_col_b:
                                         date_in_col_b = date_in_col_b.strip()
-                                except:
-                                    pass
                             
-                            # Convert selected_day to date format (e.g., "3NOV" -> "Nov 3")
-                            try:
-                                # Parse the day format (e.g., "3NOV", "4NOV")
-                                day_num = ''.join(filter(str.isdigit, selected_day))
-                                month_abbr = ''.join(filter(str.isalpha, selected_day))
-                                
-                                # Convert to "Nov 3" format
-                                month_map = {
-                                    'JAN': 'Jan', 'FEB': 'Feb', 'MAR': 'Mar', 'APR': 'Apr',
-                                    'MAY': 'May', 'JUN': 'Jun', 'JUL': 'Jul', 'AUG': 'Aug',
-                                    'SEP': 'Sep', 'OCT': 'Oct', 'NOV': 'Nov', 'DEC': 'Dec'
-                                }
-                                
-                                formatted_date = f"{month_map.get(month_abbr.upper(), month_abbr)} {day_num}"
-                                
-                                # Check if dates match
-                                if date_in_col_b and date_in_col_b == formatted_date:
+                                # Check if dates match (e.g., "3NOV" -> "Nov 3")
+                                if date_in_col_b and date_in_col_b == day_header_date(selected_day):
                                     matched = True
-                                    
-                            except:
-                                pass
                             
-                            for name in ingredient_order:
-                                # Get Type and Price from ingredients sheet
-                                rm_type = "N/A"
-                                rm_price = 0
-                                qty_conv = 1
-                                
-                                if not ingredients_df.empty:
-                                    name_normalized = name.strip().lower()
-                                    
-                                    # Match against Column G (index 6) for Type in Column H (index 7)
-                                    type_row = ingredients_df[
-                                        ingredients_df.iloc[:, 6].astype(str).str.strip().str.lower() == name_normalized
-                                    ]
-                                    
-                                    if not type_row.empty and len(type_row.iloc[0]) > 7:
-                                        rm_type_value = type_row.iloc[0].iloc[7]
-                                        if pd.notna(rm_type_value) and rm_type_value != '':
-                                            rm_type = str(rm_type_value)
-                                    
-                                    # Match against Column B (index 1) for Price in Column E (index 4) and Qty Conv
-                                    price_row = ingredients_df[
-                                        ingredients_df['_normalized_ingredient'] == name_normalized
-                                    ]
-                                    
-                                    if not price_row.empty:
-                                        if len(price_row.iloc[0]) > 4:
-                                            try:
-                                                price_value = price_row.iloc[0].iloc[4]
-                                                if pd.notna(price_value) and price_value != '':
-                                                    price_str = str(price_value).replace('₱', '').replace(',', '').strip()
-                                                    rm_price = float(price_str)
-                                            except (ValueError, TypeError, IndexError):
-                                                rm_price = 0
-                                        
-                                        if len(price_row.iloc[0]) > 3:
-                                            try:
-                                                qty_conv_value = price_row.iloc[0].iloc[3]
-                                                if pd.notna(qty_conv_value) and qty_conv_value != '':
-                                                    qty_conv = float(qty_conv_value)
-                                                    if qty_conv == 0:
-                                                        qty_conv = 1
-                                            except (ValueError, TypeError, IndexError):
-                                                qty_conv = 1
-                                
                                 # Apply filter
-                                if selected_rm_type != "All" and rm_type != selected_rm_type:
-                                    continue
-                                
-                                # Find beginning inventory for this ingredient
-                                beginning_inv = 0
-                                if not beginning_inventory_df.empty and matched:
-                                    # Only get beginning inventory if date matched
-                                    name_normalized = name.strip().lower()
-                                    
-                                    inv_row = beginning_inventory_df[
-                                        beginning_inventory_df['_normalized_raw_material'] == name_normalized
-                                    ]
-                                    
-                                    if not inv_row.empty:
-                                        # Get beginning inventory value from Column B (index 1)
-                                        try:
-                                            if len(inv_row.iloc[0]) > 1:
-                                                inv_value = inv_row.iloc[0].iloc[1]
-                                                if pd.notna(inv_value) and inv_value != '':
-                                                    beginning_inv = float(inv_value)
-                                        except (ValueError, TypeError, IndexError):
-                                            beginning_inv = 0
+                                filtered_materials = plan_cube.materials_for(selected_day_index - 1, selected_rm_type)
+                            
+                                with span('aggregate:raw_materials', rows=len(filtered_materials)):
+                                    for item in filtered_materials.itertuples(index=False):
+                                        # Inventory on hand from Column B, only if the date matched
+                                        beginning_inv = item.on_hand if matched else 0
                                 
-                                # Add to filtered totals
-                                filtered_total_inventory += beginning_inv
-                                if beginning_inv > 0:
-                                    item_price = (beginning_inv / qty_conv) * rm_price
-                                    filtered_total_price += item_price
+                                        # Add to filtered totals
+                                        filtered_total_inventory += beginning_inv
+                                        if beginning_inv > 0:
+                                            filtered_total_price += item.on_hand_cost
                                 
-                                ingredients_list.append({
-                                    "Raw Material": name,
-                                    "Type": rm_type,
-                                    "Price": f"₱{rm_price:,.2f}",
-                                    "Inventory on Hand (KG)": f"{beginning_inv:,.2f}"
-                                })
+                                        ingredients_list.append({
+                                            "Raw Material": item.ingredient,
+                                            "Type": item.rm_type,
+                                            "Price": f"₱{item.price:,.2f}",
+                                            "Inventory on Hand (KG)": f"{beginning_inv:,.2f}"
+                                        })
                             
-                            # After loop completes, display filtered totals
-                            with total_price_placeholder:
-                                st.markdown(f"""
-                                    <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
-                                        <span class="weight-label">Daily Total Price ({selected_day}):</span> ₱{filtered_total_price:,.2f}
-                                    </div>
-                                """, unsafe_allow_html=True)
+                                # After loop completes, display filtered totals
+                                with total_price_placeholder:
+                                    st.markdown(f"""
+                                        <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
+                                            <span class="weight-label">Daily Total Price ({selected_day}):</span> ₱{filtered_total_price:,.2f}
+                                        </div>
+                                    """, unsafe_allow_html=True)
                             
-                            with total_inventory_placeholder:
-                                st.markdown(f"""
-                                    <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
-                                        <span class="weight-label">Daily Total Inventory ({selected_day}):</span> {filtered_total_inventory:,.2f} KG
-                                    </div>
-                                """, unsafe_allow_html=True)
+                                with total_inventory_placeholder:
+                                    st.markdown(f"""
+                                        <div class="total-weight-box" style="margin-bottom: 1.5rem; margin-top: 0.5rem;">
+                                            <span class="weight-label">Daily Total Inventory ({selected_day}):</span> {filtered_total_inventory:,.2f} KG
+                                        </div>
+                                    """, unsafe_allow_html=True)
                             
-                            if ingredients_list:
-                                ingredients_display_df = pd.DataFrame(ingredients_list)
+                                if ingredients_list:
+                                    ingredients_display_df = pd.DataFrame(ingredients_list)
                                 
-                                html_table = ingredients_display_df.to_html(
-                                    escape=False,
-                                    index=False,
-                                    classes='wps-table',
-                                    table_id='ingredients-explosion-daily'
-                                )
+                                    with span('render:raw_materials_table', rows=len(ingredients_display_df)):
+                                        html_table = ingredients_display_df.to_html(
+                                            escape=False,
+                                            index=False,
+                                            classes='wps-table',
+                                            table_id='ingredients-explosion-daily'
+                                        )
                                 
-                                table_html = f"""
-                                <div class="wps-table-container">
-                                    {html_table}
-                                </div>
-                                """
+                                    table_html = f"""
+                                    <div class="wps-table-container">
+                                        {html_table}
+                                    </div>
+                                    """
                                 
-                                st.markdown(table_html, unsafe_allow_html=True)
+                                    st.markdown(table_html, unsafe_allow_html=True)
+                                else:
+                                    st.warning(f"No ingredients found for filter: {selected_rm_type}")
                             else:
-                                st.warning(f"No ingredients found for filter: {selected_rm_type}")
-                        else:
-                            st.warning("No ingredients data found for selected day")
+                                st.warning("No ingredients data found for selected day")
+                    else:
+                        st.warning(f"No subrecipes scheduled for {selected_day}")
                 else:
-                    st.warning(f"No subrecipes scheduled for {selected_day}")
+                    st.warning("No valid WPS data found after filtering")
             else:
-                st.warning("No valid WPS data found after filtering")
-        else:
-            st.error(f"Not enough columns in WPS data. Found {len(wps_df.columns)} columns, need at least 22.")
+                st.error("Not enough columns in WPS data. Columns P-V (the seven days) are empty.")
+
+    daily_inventory()
+
+finish_recording(page_recorder)
+show_perf_panel(page_recorder)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,107 @@
+"""Read budget, backoff and request coalescing of the gateway, on a fake clock"""
+import threading
+import time
+import pytest
+from srcore import SheetsGateway, DataSource, QuotaExceededError, SourceUnavailableError
+from srcore import gateway as gateway_module
+
+class FakeClock:
+    """Stands in for the time module in the gateway: sleeping only moves the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class ScriptedSource(DataSource):
+    """Revision source that raises the given errors first, then answers"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_revision(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'version': '1'}
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gateway_module, 'time', clock)
+    return clock
+
+def test_read_budget_waits_for_the_window_to_free_a_slot(clock):
+    gateway = SheetsGateway(ScriptedSource(), reads_per_minute=2, budget_wait=120)
+    for _ in range(3):
+        gateway.get_revision()
+    # The third request waits until the first one leaves the one-minute window
+    assert clock.sleeps == [60.0]
+    assert gateway.stats()['throttled_seconds'] == 60.0
+    assert gateway.requests_sent == 3
+
+def test_read_budget_gives_up_past_the_budget_wait(clock):
+    source = ScriptedSource()
+    gateway = SheetsGateway(source, reads_per_minute=2, budget_wait=10)
+    gateway.get_revision()
+    gateway.get_revision()
+    with pytest.raises(QuotaExceededError):
+        gateway.get_revision()
+    assert clock.sleeps == [] and source.calls == 2
+
+def test_read_budget_needs_at_least_one_read():
+    with pytest.raises(ValueError):
+        SheetsGateway(ScriptedSource(), reads_per_minute=0)
+
+def test_throttled_requests_retry_with_jittered_backoff(clock):
+    source = ScriptedSource([QuotaExceededError('429'), QuotaExceededError('429'), SourceUnavailableError('503')])
+    gateway = SheetsGateway(source, backoff_base=1.0, backoff_max=3.0)
+    assert gateway.get_revision() == {'version': '1'}
+    assert source.calls == 4
+    assert gateway.retries == 3 and gateway.quota_errors == 2
+    # Each delay is drawn up to the capped exponential: 1, 2, then 4 capped to 3 seconds
+    assert len(clock.sleeps) == 3
+    for delay, cap in zip(clock.sleeps, [1.0, 2.0, 3.0]):
+        assert 0 <= delay <= cap
+
+def test_retries_stop_after_max_retries(clock):
+    source = ScriptedSource([QuotaExceededError('429')] * 3)
+    with pytest.raises(QuotaExceededError):
+        SheetsGateway(source, max_retries=2).get_revision()
+    assert source.calls == 3
+
+def test_identical_concurrent_requests_share_one_call():
+    started, release = threading.Event(), threading.Event()
+
+    class SlowSource(ScriptedSource):
+        def get_revision(self):
+            started.set()
+            release.wait(5)
+            return super().get_revision()
+
+    source = SlowSource()
+    gateway = SheetsGateway(source)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway.get_revision()))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(gateway.get_revision())) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    # Every follower has found the request in flight before it is answered
+    deadline = time.monotonic() + 5
+    while gateway.coalesced < len(followers) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert source.calls == 1
+    assert gateway.coalesced == 5
+    assert results == [{'version': '1'}] * 6
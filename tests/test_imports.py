@@ -0,0 +1,27 @@
+"""What each entry point imports: the headless core and the benchmarks load without the Google client libraries"""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def import_without_google(*modules):
+    """Import `modules` in a fresh interpreter where gspread, google-auth and requests cannot be imported"""
+    code = "import sys\n" + "".join(f"sys.modules[{name!r}] = None\n" for name in ('gspread', 'google', 'requests'))
+    code += "".join(f"import {module}\n" for module in modules)
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+
+def test_srcore_imports_without_google_client():
+    result = import_without_google('srcore', 'srcore.sync')
+    assert result.returncode == 0, result.stderr
+
+def test_srcore_does_not_import_google_client():
+    code = "import sys, srcore\nassert 'gspread' not in sys.modules and 'srcore.sheets' not in sys.modules\n"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_benchmarks_import_without_google_client():
+    result = import_without_google(
+        'benchmarks.run', 'benchmarks.refresh', 'benchmarks.sessions', 'benchmarks.replicas', 'benchmarks.synthetic'
+    )
+    assert result.returncode == 0, result.stderr
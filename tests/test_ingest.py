@@ -0,0 +1,50 @@
+"""Cell conversion at ingest and the subrecipe sheet's parse errors"""
+import numpy as np
+import pandas as pd
+from srcore.ingest import clean_blanks, to_number, to_integer, to_key
+from srcore.datasets import parse_subrecipe_data
+
+def cells(*values):
+    return clean_blanks(pd.Series(values, dtype=object))
+
+def test_accounting_zeros_and_separators():
+    numbers = to_number(cells('-', ' - ', '.00', '- .0', '-0.0', '1,234.5', '-2', 'abc', ''))
+    np.testing.assert_array_equal(numbers.to_numpy(), [0, 0, 0, 0, 0, 1234.5, -2, np.nan, np.nan])
+
+def test_peso_prices():
+    prices = to_number(cells('₱1,234.50', ' ₱ 12', '₱-', '12'), price=True)
+    np.testing.assert_array_equal(prices.to_numpy(), [1234.5, 12, 0, 12])
+
+def test_integers_truncate_and_reject_what_int64_cannot_hold():
+    integers = to_integer(cells('12.9', '-3.7', '1e30', '-1e19', 'inf', 'x', ''))
+    assert integers.dtype == 'Int64'
+    assert integers.tolist() == [12, -3, pd.NA, pd.NA, pd.NA, pd.NA, pd.NA]
+
+def test_keys_are_normalized_categories():
+    keys = to_key(cells(' Flour ', 'FLOUR', 'Sugar', ''))
+    assert keys.dtype == 'category'
+    assert keys.astype(object).where(keys.notna(), None).tolist() == ['flour', 'flour', 'sugar', None]
+
+def subrecipe_sheet(*rows):
+    """Sheet index 1 with name (A), pack size (G), shelf life (H) and storage condition (I)"""
+    header = ['Subrecipe', 'B', 'C', 'D', 'E', 'F', 'Pack Size', 'Shelf Life', 'Storage']
+    return [header] + [[name, '', '', '', '', '', pack_size, shelf_life, 'Chiller'] for name, pack_size, shelf_life in rows]
+
+def test_parse_errors_report_pack_size_first():
+    df = parse_subrecipe_data(subrecipe_sheet(
+        ('Good', '1.5', '7'),
+        ('Bad Pack', 'one', 'x'),
+        ('Bad Shelf', '2', 'x'),
+        ('Huge Shelf', '2', '1e30'),
+        ('Blank', '', ''),
+    ))
+    assert df['name'].tolist() == ['Good', 'Bad Pack', 'Bad Shelf', 'Huge Shelf', 'Blank']
+    assert df['key'].tolist()[0] == 'good'
+    assert df['shelf_life'].tolist() == [7, pd.NA, pd.NA, pd.NA, pd.NA]
+    assert df['parse_error'].tolist() == [
+        pd.NA,
+        "could not convert string to float: 'one'",
+        "could not convert string to float: 'x'",
+        "cannot convert float 1e+30 to integer",
+        pd.NA,
+    ]
@@ -0,0 +1,100 @@
+"""Raw material demand of a batch plan: totals and the order ingredients first appear in"""
+import numpy as np
+from srcore import PLAN_DAYS, WEEK_COLUMN, WPS_SHEET, BomMatrix, plan_demand, snapshot_from_grids
+
+def bom_matrix(recipes):
+    """BOM matrix from {recipe key: [(ingredient, key, qty per batch)]}, lines in sheet order"""
+    recipe_positions, ingredient_positions, keys, entries = {}, {}, [], []
+    for recipe_key, lines in recipes.items():
+        recipe = recipe_positions.setdefault(recipe_key, len(recipe_positions))
+        for line_number, (ingredient, key, qty) in enumerate(lines):
+            if ingredient not in ingredient_positions:
+                ingredient_positions[ingredient] = len(ingredient_positions)
+                keys.append(key)
+            entries.append((recipe, ingredient_positions[ingredient], line_number, qty))
+    entries = np.array(entries, dtype=float)
+    return BomMatrix(
+        recipe_positions, np.array(list(ingredient_positions), dtype=object), np.array(keys, dtype=object),
+        entries[:, 0].astype(np.int32), entries[:, 1].astype(np.int32), entries[:, 2].astype(np.int32), entries[:, 3]
+    )
+
+def batches(*days):
+    """Plan rows of batches on the first days of the week"""
+    plan = np.zeros((len(days), PLAN_DAYS))
+    for row, values in enumerate(days):
+        plan[row, :len(values)] = values
+    return plan
+
+def test_ingredients_follow_plan_rows_then_bom_lines():
+    matrix = bom_matrix({
+        'sauce': [('Tomato', 'tomato', 2.0), ('Salt', 'salt', 0.1)],
+        'dough': [('Flour', 'flour', 5.0), ('Salt', 'salt', 0.2)],
+    })
+    # Dough is planned first, with no batches on day 1; names match case-insensitively; unknown rows count for nothing
+    cube = plan_demand(['Dough ', 'SAUCE', 'Unknown'], batches([0, 2], [1, 1], [4, 4]), matrix)
+
+    week = cube.column(WEEK_COLUMN)
+    assert week['ingredient'].tolist() == ['Flour', 'Salt', 'Tomato']
+    np.testing.assert_allclose(week['total_qty'], [10.0, 0.2 * 2 + 0.1 * 2, 2.0 * 2])
+
+    day_one = cube.column(0)
+    assert day_one['ingredient'].tolist() == ['Tomato', 'Salt']
+    np.testing.assert_allclose(day_one['total_qty'], [2.0, 0.1])
+    assert cube.column(2).empty
+
+def test_matches_a_row_by_row_explosion(grids):
+    snapshot = snapshot_from_grids(grids)
+    plan = snapshot.get('wps_plan')
+    recipe_lines = snapshot.get('recipe_lines')
+    cube = plan_demand(plan.table['Subrecipe'], plan.batches, snapshot.get('bom_matrix'))
+
+    for column in range(PLAN_DAYS + 1):
+        totals = {}
+        for name, day_batches in zip(plan.table['Subrecipe'], plan.batches):
+            count = day_batches.sum() if column == WEEK_COLUMN else day_batches[column]
+            if column != WEEK_COLUMN and count <= 0:
+                continue
+            for line in recipe_lines.get(str(name).strip().lower(), ()):
+                if line.qty_per_batch > 0:
+                    totals[line.ingredient] = totals.get(line.ingredient, 0.0) + line.qty_per_batch * count
+        frame = cube.column(column)
+        assert frame['ingredient'].tolist() == list(totals)
+        np.testing.assert_allclose(frame['total_qty'], list(totals.values()))
+
+def test_no_plan_when_the_day_columns_are_empty(grids):
+    # WPS rows with subrecipes in column A but nothing in columns P-V
+    snapshot = snapshot_from_grids({**grids, WPS_SHEET: [row[:15] for row in grids[WPS_SHEET]]})
+    assert not snapshot.get('wps').empty
+    assert snapshot.get('wps_plan') is None
+    assert snapshot.get('plan_cube') is None
+
+def wps_sheet(grids, day_cells):
+    """The synthetic WPS with its plan replaced: one row per subrecipe name and its seven day cells (P-V)"""
+    header = grids[WPS_SHEET][:10]
+    width = len(header[9])
+    rows = [[name] + [''] * 14 + list(days) + [''] * (width - 22) for name, days in day_cells]
+    return {**grids, WPS_SHEET: header + rows}
+
+def test_rows_need_a_positive_or_non_numeric_day(grids):
+    snapshot = snapshot_from_grids(wps_sheet(grids, [
+        ('Blank', [''] * 7),
+        ('Spaces', ['  '] * 7),
+        ('Zeros', ['0', '-', '.00', '- .0', '-0.0', '0', '0']),
+        ('Negative', ['-2', '', '', '', '', '', '']),
+        ('NaN Text', ['nan', '', '', '', '', '', '']),
+        ('Blanks And One', ['', '', '1', '', '', '', '']),
+        ('Zeros And Half', ['0', '0.5', '0', '', '0', '0', '0']),
+        ('Text', ['', 'TBC', '', '', '', '', '']),
+        ('Hot Kitchen', ['1'] * 7),
+        ('', ['1'] * 7),
+    ]))
+    plan = snapshot.get('wps_plan')
+    # Blank, whitespace, zero, negative and 'nan' cells are no batches; section headers and unnamed rows go too
+    assert plan.table['Subrecipe'].tolist() == ['Blanks And One', 'Zeros And Half', 'Text']
+    # Text days are kept for display but count as no batches in the demand
+    np.testing.assert_array_equal(plan.batches, [
+        [0, 0, 1, 0, 0, 0, 0],
+        [0, 0.5, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0],
+    ])
+    assert list(plan.day_plan(2)['Subrecipe']) == ['Blanks And One']
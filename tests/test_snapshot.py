@@ -0,0 +1,95 @@
+"""Saving and mapping snapshots, and the refresh status shared between processes"""
+import pandas as pd
+from srcore import (
+    DATASETS, PAGE_SOURCES, SPREADSHEET_ID, WEEK_COLUMN, LocalSheetsSource, SheetsGateway, QuotaExceededError,
+    RawSheetCache, RefreshController, SnapshotStore, SnapshotLease, SnapshotRefresher, snapshot_from_grids,
+    enable_copy_on_write,
+)
+from srcore.snapshot import copy_on_write
+
+def cell_values(df):
+    """Frame as the models read it: text may come back as a string dtype, and any missing value is blank"""
+    return df.astype(object).where(df.notna(), None)
+
+def make_refresher(source, directory, **options):
+    """Refresher on the local source, polling the revision on every refresh and never retrying"""
+    gateway = SheetsGateway(source, max_retries=0)
+    controller = RefreshController(gateway, RawSheetCache(SPREADSHEET_ID), check_seconds=0)
+    return SnapshotRefresher(controller, SnapshotStore(directory), **options)
+
+def test_saved_snapshot_maps_back_unchanged(grids, tmp_path):
+    snapshot = snapshot_from_grids(grids, revision='1')
+    for name in DATASETS:
+        snapshot.get(name)
+    store = SnapshotStore(tmp_path)
+    store.save(snapshot)
+
+    loaded = SnapshotStore(tmp_path).load()
+    assert loaded.version == snapshot.version
+    assert loaded.source == 'disk'
+    for name in DATASETS:
+        expected, actual = snapshot.get(name), loaded.get(name)
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(cell_values(actual), cell_values(expected))
+        else:
+            assert list(actual) == list(expected)
+    # Derived datasets rebuilt from the mapped sheets match the ones built from the download
+    pd.testing.assert_frame_equal(
+        loaded.get('plan_cube').materials_for(WEEK_COLUMN), snapshot.get('plan_cube').materials_for(WEEK_COLUMN)
+    )
+
+def test_pages_get_copy_on_write_views_of_shared_frames(grids):
+    enable_copy_on_write()
+    assert copy_on_write()
+    snapshot = snapshot_from_grids(grids)
+    page = snapshot.get('subrecipe')
+    page.iloc[0, 0] = 'edited by one page'
+    # The write copied only that page's view; the snapshot every session reads is unchanged
+    assert snapshot.get('subrecipe').iloc[0, 0] != 'edited by one page'
+
+def test_store_ignores_other_formats(grids, tmp_path, monkeypatch):
+    snapshot = snapshot_from_grids(grids, revision='1')
+    snapshot.get('subrecipe')
+    SnapshotStore(tmp_path).save(snapshot)
+    monkeypatch.setattr(SnapshotStore, 'FORMAT', SnapshotStore.FORMAT + 1)
+    assert SnapshotStore(tmp_path).load() is None
+
+def test_only_one_process_holds_the_lease(tmp_path):
+    first, second = SnapshotLease(tmp_path), SnapshotLease(tmp_path)
+    assert first.acquire()
+    assert not second.acquire() and not second.held
+
+def test_revision_check_failures_count_even_with_recent_grids(grids, tmp_path):
+    source = LocalSheetsSource(grids)
+    refresher = make_refresher(source, tmp_path)
+    refresher.refresh()
+    assert refresher.last_error is None and refresher.snapshot is not None
+
+    source.quota_rate = 1.0
+    refresher.refresh()
+    assert isinstance(refresher.last_error, QuotaExceededError)
+    assert refresher.consecutive_failures == 1
+    # The snapshot already served stays in place
+    assert refresher.snapshot is not None
+
+def test_reader_follows_the_published_snapshot_and_status(grids, tmp_path):
+    source = LocalSheetsSource(grids)
+    leader = make_refresher(source, tmp_path, lease=SnapshotLease(tmp_path))
+    leader.refresh()
+    reader = SnapshotRefresher(None, SnapshotStore(tmp_path))
+    reader.refresh()
+    assert leader.leader and reader.reader and not reader.leader
+    assert reader.snapshot.version == leader.snapshot.version
+    assert reader.snapshot.source == 'shared'
+    assert reader.last_error is None
+    assert source.calls['batch_get_ranges'] == 1
+    # With no page of its own open, the leader parses and saves the sheets the pages read, and derives nothing
+    assert leader.store.saved == set(PAGE_SOURCES)
+    assert set(leader.snapshot.materialized()) == set(PAGE_SOURCES)
+
+    # The leader's failure reaches the reader through the published status
+    source.quota_rate = 1.0
+    leader.refresh()
+    reader.refresh()
+    assert isinstance(reader.last_error, QuotaExceededError)
+    assert reader.status['consecutive_failures'] == 1
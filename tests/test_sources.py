@@ -0,0 +1,64 @@
+"""A1 ranges, range slicing and joining, and the local stand-in spreadsheet"""
+import pytest
+from srcore import LocalSheetsSource, SourceUnavailableError, QuotaExceededError, write_fixture
+from srcore.sources import pad_rows, parse_a1, slice_range, download_ranges, join_ranges
+
+def test_parse_a1():
+    assert parse_a1('B3') == (2, 2, 1, 1)
+    assert parse_a1('A1:I') == (0, None, 0, 8)
+    assert parse_a1('A:C') == (0, None, 0, 2)
+    assert parse_a1('p3:v20') == (2, 19, 15, 21)
+    assert parse_a1('AA1:AB2') == (0, 1, 26, 27)
+    with pytest.raises(ValueError):
+        parse_a1('A1:B2:C3')
+
+def test_slice_range_drops_trailing_blanks_like_the_api():
+    grid = [
+        ['a', 'b', 'c', ''],
+        ['d', '', '', ''],
+        ['', '', '', ''],
+    ]
+    assert slice_range(grid, 'A1:D') == [['a', 'b', 'c'], ['d']]
+    assert slice_range(grid, 'B1:C3') == [['b', 'c']]
+    assert slice_range(grid, 'C2') == []
+
+def test_download_ranges_folds_covered_ranges_into_the_widest():
+    ranges = [(1, 'A1:I'), (1, 'A2:C5'), (4, 'A2:C5'), (4, 'A1')]
+    assert download_ranges(ranges) == {
+        (1, 'A1:I'): (1, 'A1:I'),
+        (1, 'A2:C5'): (1, 'A1:I'),
+        (4, 'A2:C5'): (4, 'A2:C5'),
+        (4, 'A1'): (4, 'A1'),
+    }
+
+def test_join_ranges_keeps_column_positions():
+    # The first range is padded to its declared width, so the second one starts at the fourth column
+    assert join_ranges([[['a'], ['b', 'c']], [['x', 'y']]], ['A1:C', 'P1:Q']) == [
+        ['a', '', '', 'x', 'y'],
+        ['b', 'c', '', '', ''],
+    ]
+    # An empty last range adds no columns
+    assert join_ranges([[['a']], []], ['A1:B', 'P1:Q']) == [['a', '']]
+    # A single range is as wide as its widest row
+    assert join_ranges([[['a'], ['b', 'c']]], ['A1:Z']) == [['a', ''], ['b', 'c']]
+
+def test_local_source_serves_ranges_and_counts_calls():
+    source = LocalSheetsSource({1: [['a', 'b', ''], ['c', '', '']]}, revision='7')
+    assert source.get_revision()['version'] == '7'
+    assert source.batch_get_ranges([(1, 'A1:C'), (1, 'B1')]) == {(1, 'A1:C'): [['a', 'b'], ['c']], (1, 'B1'): [['b']]}
+    assert source.calls == {'get_revision': 1, 'batch_get_values': 0, 'batch_get_ranges': 1}
+    source.update({1: [['z']]})
+    assert source.get_revision()['version'] == '8'
+
+def test_local_source_injects_failures():
+    with pytest.raises(SourceUnavailableError):
+        LocalSheetsSource({}, error_rate=1.0).get_revision()
+    with pytest.raises(QuotaExceededError):
+        LocalSheetsSource({}, quota_rate=1.0).get_revision()
+
+def test_local_source_round_trips_fixtures(grids, tmp_path):
+    path = tmp_path / 'fixture.json'
+    write_fixture(path, grids, revision='3')
+    source = LocalSheetsSource.from_fixture(path)
+    assert source.revision == '3'
+    assert source.batch_get_values(list(grids)) == {key: pad_rows(rows) for key, rows in grids.items()}